@@ -2,12 +2,19 @@ from flask import Flask, render_template, request, session, jsonify, redirect, u
 from flask_socketio import SocketIO, emit, join_room, leave_room
 import secrets
 import json
+import concurrent.futures
 from datetime import datetime, timedelta
 import os
 import threading
 import time
 from lobby_manager import LobbyManager
 from game_logic import PrismWarsGame
+import batch_engine
+import bots
+import layouts
+import previews
+import state_sync
+import transpositions
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = secrets.token_hex(32)
@@ -16,6 +23,47 @@ socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
 # Initialize managers
 lobby_manager = LobbyManager()
 
+# Send the mover every hover preview once per turn state instead of one
+# request per mouse move; on by default when NumPy can batch the traces
+PREVIEW_BUNDLES = os.environ.get('PRISM_PREVIEW_BUNDLES', '1' if batch_engine.np is not None else '0') == '1'
+
+# Single previews are warmed one game at a time on one background thread
+prewarm_executor = concurrent.futures.ThreadPoolExecutor(1)
+
+# Only the newest preview request per client is computed, within a token bucket
+preview_throttle = previews.PreviewThrottle(
+    rate=float(os.environ.get('PRISM_PREVIEW_RATE', '15')),
+    burst=int(os.environ.get('PRISM_PREVIEW_BURST', '5'))
+)
+
+# Traces and scores of positions seen by any game, shared by all of them
+transpositions.shared.max_entries = int(os.environ.get('PRISM_TRANSPOSITION_ENTRIES', '2048'))
+
+# Bot seats choose their moves in worker processes (PRISM_BOT_WORKERS=0 uses threads)
+bot_pool = bots.BotPool(int(os.environ.get('PRISM_BOT_WORKERS', '2')))
+
+# Hints are ranked on the bot pool within this CPU budget (seconds); one
+# request per client at a time, and one ranking per game state
+HINT_BUDGET = float(os.environ.get('PRISM_HINT_BUDGET', '0.25'))
+HINT_COUNT = 5
+hint_lock = threading.Lock()
+hint_pending = set()    # sids with a hint being ranked
+hint_results = {}       # game_id -> (state_version, hint payload)
+
+# State updates go to a per-encoding room of the game, since clients may
+# ask for board and territory as binary attachments instead of JSON
+client_encodings = {}   # sid -> encoding chosen on join_game_room
+
+# Room broadcasts queued within this window go out together, each with only
+# the newest state; events that must follow them (game_over, game_starting)
+# flush the room first. 0 sends every broadcast at once. Each room sends in
+# the order its turns were taken, independently of every other room.
+BROADCAST_WINDOW = float(os.environ.get('PRISM_BROADCAST_WINDOW_MS', '30')) / 1000
+broadcast_lock = threading.Lock()  # guards the three dicts below, never held while sending
+pending_broadcasts = {}  # room -> {key: prepare}, in the order keys were first queued
+room_turns = {}          # room -> [Condition, next turn to hand out, turn now sending]
+broadcast_stats = {'queued': 0, 'coalesced': 0, 'flushes': 0}
+
 # Ensure data directory exists
 os.makedirs('data/games', exist_ok=True)
 
@@ -32,11 +80,221 @@ def load_saved_games():
                         game = PrismWarsGame.from_dict(game_data)
                         lobby_manager.games[game_id] = game
                         print(f"Loaded game: {game_id}")
+                        schedule_bot_move(game_id)
                 except Exception as e:
                     print(f"Error loading game {game_id}: {e}")
     except Exception as e:
         print(f"Error loading games directory: {e}")
 
+def take_turn(room):
+    """The room's next turn to send, to pass to send_in_turn(); call with broadcast_lock held"""
+    turns = room_turns.get(room)
+    if turns is None:
+        turns = room_turns[room] = [threading.Condition(), 0, 0]
+    turn = turns[1]
+    turns[1] += 1
+    return turns, turn
+
+def send_in_turn(room, ticket, sends):
+    """Call each send() once the room's earlier turns have sent, holding only that room's lock"""
+    turns, turn = ticket
+    with turns[0]:
+        while turns[2] != turn:
+            turns[0].wait()
+        try:
+            for send in sends:
+                try:
+                    send()
+                except Exception as e:
+                    print(f"Error sending broadcast to {room}: {e}")
+        finally:
+            turns[2] += 1
+            turns[0].notify_all()
+
+def queue_broadcast(room, key, prepare):
+    """Send the room prepare()'s payload when its window closes; a newer prepare under the same key replaces the older one.
+
+    prepare() builds the payload outside any lock and returns the send()
+    that emits it in the room's turn.
+    """
+    with broadcast_lock:
+        broadcast_stats['queued'] += 1
+        pending = pending_broadcasts.get(room)
+        if pending is None:
+            pending = pending_broadcasts[room] = {}
+            if BROADCAST_WINDOW > 0:
+                timer = threading.Timer(BROADCAST_WINDOW, flush_broadcasts, (room,))
+                timer.daemon = True
+                timer.start()
+        elif key in pending:
+            broadcast_stats['coalesced'] += 1
+        pending[key] = prepare
+    
+    if BROADCAST_WINDOW <= 0:
+        flush_broadcasts(room)
+
+def flush_broadcasts(room):
+    """Send everything queued for the room now"""
+    # The turn is taken with the queue, so a flush never overtakes an earlier one
+    with broadcast_lock:
+        pending = pending_broadcasts.pop(room, None)
+        if not pending:
+            return
+        broadcast_stats['flushes'] += 1
+        ticket = take_turn(room)
+    
+    sends = []
+    for prepare in pending.values():
+        try:
+            sends.append(prepare())
+        except Exception as e:
+            print(f"Error preparing broadcast to {room}: {e}")
+    send_in_turn(room, ticket, sends)
+
+def send_now(room, send):
+    """Call send() in the room's next turn, after whatever is still queued for it"""
+    flush_broadcasts(room)
+    with broadcast_lock:
+        ticket = take_turn(room)
+    send_in_turn(room, ticket, [send])
+
+def broadcast_now(room, event, data):
+    """Emit an event to the room right away, after whatever is still queued for it"""
+    send_now(room, lambda: socketio.emit(event, data, room=room))
+
+def forget_room(room):
+    """Drop a removed game's broadcast queue and turns"""
+    with broadcast_lock:
+        pending_broadcasts.pop(room, None)
+        room_turns.pop(room, None)
+
+def lobby_state(game):
+    return {
+        'players': game.players,
+        'max_players': game.max_players,
+        'state': game.state
+    }
+
+def broadcast_lobby(game_id, game):
+    """Queue the lobby's player list for everyone in it"""
+    def prepare():
+        data = lobby_state(game)
+        return lambda: socketio.emit('lobby_update', data, room=game_id)
+    queue_broadcast(game_id, 'lobby_update', prepare)
+
+def state_room(game_id, encoding):
+    return f'{game_id}:{encoding}'
+
+def emit_state_update(game_id, update):
+    """Send a state update to the game room, in each client's encoding"""
+    socketio.emit('game_state_update', update, room=state_room(game_id, 'json'))
+    socketio.emit('game_state_update', state_sync.binary_update(update), room=state_room(game_id, 'binary'))
+
+def prepare_state(game):
+    """The game's state if it changed since its last update; building it is the costly part of an update"""
+    if game.state_sync.unchanged(game.state_version) is not None:
+        return None
+    return game.get_state()
+
+def broadcast_state(game_id, game):
+    """Queue sending the game room what changed since the game's last update"""
+    # The state is built when the window closes, so it covers every change queued until then;
+    # only the diff against the last update is taken in the room's turn, so updates go out in order
+    def prepare():
+        state = prepare_state(game)
+        return lambda: emit_state_update(game_id, game.get_state_update(state))
+    queue_broadcast(game_id, 'game_state_update', prepare)
+
+def send_full_state(game_id, game):
+    """Send the requesting client the whole state, after telling the room about any change it has not seen"""
+    sid = request.sid
+    encoding = client_encodings.get(sid, 'json')
+    state = prepare_state(game)
+    
+    def send():
+        update = game.get_state_update(state)
+        if update['seq'] != update['base_seq']:
+            emit_state_update(game_id, update)
+        socketio.emit('game_state_update', game.get_full_state(encoding), room=sid)
+    send_now(game_id, send)
+
+def serves_bundles(game):
+    """Whether the mover gets a preview bundle rather than asking for single previews"""
+    return PREVIEW_BUNDLES and game.board_size <= previews.MAX_BUNDLE_BOARD_SIZE
+
+def prewarm_previews(game):
+    """Warm the preview cache for the player to move without holding up the response"""
+    # Bundles answer every hover, and bot seats never hover
+    if game.state != 'playing' or serves_bundles(game) or game.players[game.current_player].get('bot'):
+        return
+    prewarm_executor.submit(prewarm_turn, game, game.state_version)
+
+def prewarm_turn(game, version):
+    # Turns that moved on while queued behind another game are skipped
+    if game.state_version != version:
+        return
+    try:
+        game.prewarm_previews()
+    except Exception as e:
+        print(f"Error prewarming previews: {e}")
+
+def schedule_bot_move(game_id):
+    """If a bot seat is to move, have the bot pool choose its move and play it when ready"""
+    game = lobby_manager.games.get(game_id)
+    if game is None or game.state != 'playing':
+        return
+    
+    player_idx = game.current_player
+    difficulty = game.players[player_idx].get('bot')
+    if not difficulty or player_idx in game.disconnected_players:
+        return
+    
+    # Not the state version: a reconnection bumps that without changing whose move it is
+    position = game.position_hash()
+    submitted = time.time()
+    future = bot_pool.submit(game, player_idx)
+    future.add_done_callback(lambda done: play_bot_move(game_id, player_idx, position, difficulty, submitted, done))
+
+def play_bot_move(game_id, player_idx, position, difficulty, submitted, future):
+    """Apply a bot's chosen move like a player's socket event, unless the game moved on meanwhile"""
+    try:
+        move, stats = future.result()
+    except Exception as e:
+        print(f"Error choosing bot move: {e}")
+        return
+    bot_pool.record(difficulty, stats, (time.time() - submitted) * 1000, bots.DIFFICULTIES[difficulty]['budget'])
+    
+    game = lobby_manager.games.get(game_id)
+    if (game is None or game.state != 'playing' or game.current_player != player_idx or
+            game.position_hash() != position):
+        return
+    
+    game.update_heartbeat(player_idx)
+    
+    if move[0] == 'place':
+        success, message = game.place_piece(move[1], move[2], move[3], move[4])
+    elif move[0] == 'pickup':
+        success, message = game.pickup_piece(move[1], move[2], player_idx)
+    else:
+        game.next_turn()
+        success, message = True, "Turn passed"
+    
+    # A bot never holds up the game: a rejected move passes the turn
+    if not success:
+        print(f"Bot move {move} rejected: {message}")
+        game.next_turn()
+    
+    save_game_state(game_id)
+    broadcast_state(game_id, game)
+    prewarm_previews(game)
+    schedule_bot_move(game_id)
+    
+    if game.state == 'finished':
+        broadcast_now(game_id, 'game_over', {
+            'winner': game.winner,
+            'final_scores': game.get_scores()
+        })
+
 # Turn timer check thread
 def check_turn_timers():
     """Background thread to check for turn timeouts and disconnections"""
@@ -54,26 +312,35 @@ def check_turn_timers():
                         game_ended = game.handle_turn_timeout()
                         
                         # Broadcast updated state
-                        socketio.emit('game_state_update', game.get_state(), room=game_id)
+                        broadcast_state(game_id, game)
+                        prewarm_previews(game)
+                        schedule_bot_move(game_id)
                         
                         if game_ended and game.state == 'finished':
-                            socketio.emit('game_over', {
+                            broadcast_now(game_id, 'game_over', {
                                 'winner': game.winner,
                                 'final_scores': game.get_scores(),
                                 'reason': 'Player disconnections'
-                            }, room=game_id)
+                            })
                         
                         # Save game state
                         save_game_state(game_id)
         except Exception as e:
             print(f"Error in turn timer thread: {e}")
 
-# Start timer thread
-timer_thread = threading.Thread(target=check_turn_timers, daemon=True)
-timer_thread.start()
-
-# Load saved games
-load_saved_games()
+# Bot pool workers are spawned and import this script again as __mp_main__
+# when it is run directly; only the server starts the timer and loads games
+if __name__ != '__mp_main__':
+    # Start timer thread
+    timer_thread = threading.Thread(target=check_turn_timers, daemon=True)
+    timer_thread.start()
+    
+    # Load saved games
+    load_saved_games()
+    
+    if batch_engine.np is None:
+        print("NumPy is not installed: candidate placements are traced one at a time, "
+              "and preview bundles and prewarming are off")
 
 def cleanup_old_games():
     """Remove games older than 7 days"""
@@ -82,6 +349,9 @@ def cleanup_old_games():
         game = lobby_manager.games[game_id]
         if hasattr(game, 'created_at') and game.created_at < cutoff:
             del lobby_manager.games[game_id]
+            forget_room(game_id)
+            with hint_lock:
+                hint_results.pop(game_id, None)
             try:
                 os.remove(f'data/games/{game_id}.json')
             except:
@@ -96,17 +366,21 @@ def create_game():
     data = request.json
     username = data.get('username', 'Player')
     num_players = int(data.get('num_players', 2))
+    board_size = int(data.get('board_size', layouts.CLASSIC_BOARD_SIZE))
     
     if not username or len(username.strip()) == 0:
         return jsonify({'error': 'Username required'}), 400
     
-    if num_players < 2 or num_players > 4:
+    if num_players < 2 or num_players > layouts.MAX_PLAYERS:
         return jsonify({'error': 'Invalid number of players'}), 400
     
+    if not layouts.valid_board_size(board_size):
+        return jsonify({'error': 'Invalid board size'}), 400
+    
     player_id = secrets.token_hex(16)
     session['player_id'] = player_id
     
-    game_id = lobby_manager.create_game(num_players)
+    game_id = lobby_manager.create_game(num_players, board_size)
     lobby_manager.add_player_to_game(game_id, player_id, username)
     
     return jsonify({
@@ -207,6 +481,45 @@ def check_game():
         'max_players': game.max_players
     })
 
+@app.route('/game/<game_id>/manifest')
+def game_manifest(game_id):
+    """A game's static setup; clients fetch it when the state names a new manifest_id"""
+    game_id = game_id.upper()
+    if game_id not in lobby_manager.games:
+        return jsonify({'error': 'Game not found'}), 404
+    
+    game = lobby_manager.games[game_id]
+    manifest = game.get_manifest()
+    
+    # Revalidated by ETag, so an unchanged manifest costs an empty 304
+    response = jsonify(manifest)
+    response.set_etag(game.get_manifest_id(manifest))
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+@app.route('/stats')
+def stats():
+    """Preview throttling, transposition and preview cache counters, for tuning the limits"""
+    return jsonify({
+        'previews': preview_throttle.stats(),
+        'transpositions': transpositions.shared.stats(),
+        'bots': bot_pool.stats(),
+        'broadcasts': dict(broadcast_stats, window_ms=BROADCAST_WINDOW * 1000),
+        'preview_cache': preview_cache_stats()
+    })
+
+def preview_cache_stats():
+    """Preview cache counters summed over every game, so /stats never lists game codes"""
+    totals = {'games': 0, 'entries': 0, 'hits': 0, 'misses': 0, 'evictions': 0}
+    for game in list(lobby_manager.games.values()):
+        cache = game.preview_cache.stats()
+        totals['games'] += 1
+        for key in ('entries', 'hits', 'misses', 'evictions'):
+            totals[key] += cache[key]
+    lookups = totals['hits'] + totals['misses']
+    totals['hit_rate'] = totals['hits'] / lookups if lookups else 0.0
+    return totals
+
 @app.route('/lobby/<game_id>')
 def lobby(game_id):
     game_id = game_id.upper()
@@ -245,6 +558,10 @@ def handle_connect():
 
 @socketio.on('disconnect')
 def handle_disconnect():
+    preview_throttle.forget(request.sid)
+    with hint_lock:
+        hint_pending.discard(request.sid)
+    client_encodings.pop(request.sid, None)
     print('Client disconnected')
 
 @socketio.on('heartbeat')
@@ -276,17 +593,8 @@ def handle_join_lobby(data):
     join_room(game_id)
     game = lobby_manager.games[game_id]
     
-    emit('lobby_update', {
-        'players': game.players,
-        'max_players': game.max_players,
-        'state': game.state
-    })
-    
-    emit('lobby_update', {
-        'players': game.players,
-        'max_players': game.max_players,
-        'state': game.state
-    }, room=game_id)
+    # The joiner is in the room now, so the room update reaches it too
+    broadcast_lobby(game_id, game)
 
 @socketio.on('player_ready')
 def handle_player_ready(data):
@@ -299,19 +607,47 @@ def handle_player_ready(data):
     game = lobby_manager.games[game_id]
     lobby_manager.set_player_ready(game_id, player_id)
     
-    emit('lobby_update', {
-        'players': game.players,
-        'max_players': game.max_players,
-        'state': game.state
-    }, room=game_id)
+    broadcast_lobby(game_id, game)
+    
+    start_game_if_ready(game_id, game)
+
+@socketio.on('add_bot')
+def handle_add_bot(data):
+    """Fill a lobby seat with a bot of the given difficulty"""
+    game_id = data['game_id'].upper()
+    player_id = data['player_id']
+    difficulty = data.get('difficulty', 'medium')
+    
+    if game_id not in lobby_manager.games:
+        emit('error', {'message': 'Game not found'})
+        return
+    
+    game = lobby_manager.games[game_id]
+    
+    # Only players in the lobby may add bots
+    if player_id not in [p['id'] for p in game.players]:
+        emit('error', {'message': 'Not in this game'})
+        return
     
+    if not lobby_manager.add_bot_to_game(game_id, difficulty):
+        emit('error', {'message': 'Cannot add a bot to this game'})
+        return
+    
+    broadcast_lobby(game_id, game)
+    
+    start_game_if_ready(game_id, game)
+
+def start_game_if_ready(game_id, game):
+    """Start the game once at least two players are in and all of them are ready"""
     if len(game.players) >= 2 and all(p['ready'] for p in game.players):
         lobby_manager.start_game(game_id)
         save_game_state(game_id)
+        prewarm_previews(game)
+        schedule_bot_move(game_id)
         
-        emit('game_starting', {
+        broadcast_now(game_id, 'game_starting', {
             'game_id': game_id
-        }, room=game_id)
+        })
 
 @socketio.on('join_game_room')
 def handle_join_game_room(data):
@@ -322,7 +658,14 @@ def handle_join_game_room(data):
         emit('error', {'message': 'Game not found'})
         return
     
+    # Clients that do not say get JSON
+    encoding = data.get('encoding', 'json')
+    if encoding not in state_sync.ENCODINGS:
+        encoding = 'json'
+    client_encodings[request.sid] = encoding
+    
     join_room(game_id)
+    join_room(state_room(game_id, encoding))
     game = lobby_manager.games[game_id]
     
     # Find player index and update heartbeat
@@ -331,11 +674,41 @@ def handle_join_game_room(data):
             game.update_heartbeat(i)
             break
     
-    emit('game_state_update', game.get_state())
+    send_full_state(game_id, game)
+
+@socketio.on('request_state_resync')
+def handle_request_state_resync(data):
+    """Send the full state to a client that missed an update"""
+    game_id = data['game_id'].upper()
+    
+    if game_id not in lobby_manager.games:
+        return
+    
+    send_full_state(game_id, lobby_manager.games[game_id])
 
 @socketio.on('request_preview')
 def handle_request_preview(data):
     """Handle preview request for light path visualization"""
+    # Requests arriving while this client's preview is computed replace each
+    # other; the handler that got here first serves the newest one after it
+    if not preview_throttle.submit(request.sid, data):
+        return
+    
+    while True:
+        data, wait = preview_throttle.next(request.sid)
+        if data is None:
+            if not wait:
+                break
+            # Out of tokens: the newest request is served once one refills
+            socketio.sleep(wait)
+            continue
+        try:
+            serve_preview(data)
+        except Exception as e:
+            print(f"Error serving preview: {e}")
+
+def serve_preview(data):
+    """Compute and send one preview"""
     game_id = data['game_id'].upper()
     player_id = data['player_id']
     x = data['x']
@@ -352,25 +725,102 @@ def handle_request_preview(data):
     if game.players[game.current_player]['id'] != player_id:
         return
     
-    # Check if valid placement
+    # Check if valid placement, by the same legal move masks place_piece() checks
     if x < 0 or x >= game.board_size or y < 0 or y >= game.board_size:
         return
     
-    if game.board[y][x] is not None:
+    legal = game.legal_moves(game.current_player)['place'].get(piece_type, 0)
+    if not legal >> (y * game.board_size + x) & 1:
         return
     
-    if (x, y) in game.protected_zones:
+    # Calculate preview; only the cells that differ from the committed territory are sent
+    try:
+        emit('preview_update', game.get_preview_delta(x, y, piece_type, rotation))
+        preview_throttle.record_served()
+    except Exception as e:
+        print(f"Error calculating preview: {e}")
+
+@socketio.on('request_preview_bundle')
+def handle_request_preview_bundle(data):
+    """Send the current player previews for all their legal placements at once"""
+    if not PREVIEW_BUNDLES:
+        return
+    
+    game_id = data['game_id'].upper()
+    player_id = data['player_id']
+    
+    if game_id not in lobby_manager.games:
+        return
+    
+    game = lobby_manager.games[game_id]
+    
+    # Validate it's this player's turn
+    if game.state != 'playing' or game.players[game.current_player]['id'] != player_id:
+        return
+    
+    # Clients fall back to single previews when no bundle arrives
+    if not serves_bundles(game):
         return
     
-    # Calculate preview
     try:
-        preview_territory = game.calculate_light_paths_with_preview(x, y, piece_type, rotation)
-        
-        emit('preview_update', {
-            'territory': [[list(cell) for cell in row] for row in preview_territory]
-        })
+        emit('preview_bundle', game.get_preview_bundle())
     except Exception as e:
-        print(f"Error calculating preview: {e}")
+        print(f"Error calculating preview bundle: {e}")
+
+@socketio.on('request_hint')
+def handle_request_hint(data):
+    """Send the current player their best placements, ranked on the bot pool"""
+    game_id = data['game_id'].upper()
+    player_id = data['player_id']
+    sid = request.sid
+    
+    if game_id not in lobby_manager.games:
+        return
+    
+    game = lobby_manager.games[game_id]
+    
+    # Validate it's this player's turn
+    if game.state != 'playing' or game.players[game.current_player]['id'] != player_id:
+        return
+    
+    version = game.state_version
+    with hint_lock:
+        cached = hint_results.get(game_id)
+        if cached is not None and cached[0] == version:
+            emit('hint', cached[1])
+            return
+        if sid in hint_pending:
+            return
+        hint_pending.add(sid)
+    
+    submitted = time.time()
+    future = bot_pool.submit_hint(game, game.current_player, HINT_COUNT, HINT_BUDGET)
+    future.add_done_callback(lambda done: send_hint(game_id, version, sid, submitted, done))
+
+def send_hint(game_id, version, sid, submitted, future):
+    """Send a finished hint ranking to the client that asked, unless it gave up meanwhile"""
+    with hint_lock:
+        if sid not in hint_pending:
+            return
+        hint_pending.discard(sid)
+    
+    try:
+        result = future.result()
+    except Exception as e:
+        print(f"Error ranking hints: {e}")
+        return
+    bot_pool.record('hint', result, (time.time() - submitted) * 1000, HINT_BUDGET)
+    
+    payload = {
+        'state_version': version,
+        'hints': result['hints'],
+        'scored': result['scored'],
+        'candidates': result['candidates'],
+        'complete': result['complete']
+    }
+    with hint_lock:
+        hint_results[game_id] = (version, payload)
+    socketio.emit('hint', payload, room=sid)
 
 @socketio.on('place_piece')
 def handle_place_piece(data):
@@ -400,13 +850,15 @@ def handle_place_piece(data):
     if success:
         save_game_state(game_id)
         
-        emit('game_state_update', game.get_state(), room=game_id)
+        broadcast_state(game_id, game)
+        prewarm_previews(game)
+        schedule_bot_move(game_id)
         
         if game.state == 'finished':
-            emit('game_over', {
+            broadcast_now(game_id, 'game_over', {
                 'winner': game.winner,
                 'final_scores': game.get_scores()
-            }, room=game_id)
+            })
     else:
         emit('error', {'message': message})
 
@@ -436,7 +888,9 @@ def handle_pickup_piece(data):
     
     if success:
         save_game_state(game_id)
-        emit('game_state_update', game.get_state(), room=game_id)
+        broadcast_state(game_id, game)
+        prewarm_previews(game)
+        schedule_bot_move(game_id)
     else:
         emit('error', {'message': message})
 
@@ -463,13 +917,15 @@ def handle_pass_turn(data):
     
     save_game_state(game_id)
     
-    emit('game_state_update', game.get_state(), room=game_id)
+    broadcast_state(game_id, game)
+    prewarm_previews(game)
+    schedule_bot_move(game_id)
     
     if game.state == 'finished':
-        emit('game_over', {
+        broadcast_now(game_id, 'game_over', {
             'winner': game.winner,
             'final_scores': game.get_scores()
-        }, room=game_id)
+        })
 
 @socketio.on('cancel_portal')
 def handle_cancel_portal(data):
@@ -491,7 +947,9 @@ def handle_cancel_portal(data):
     
     if success:
         save_game_state(game_id)
-        emit('game_state_update', game.get_state(), room=game_id)
+        broadcast_state(game_id, game)
+        prewarm_previews(game)
+        schedule_bot_move(game_id)
     else:
         emit('error', {'message': message})
 
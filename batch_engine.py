@@ -0,0 +1,200 @@
+"""Batched evaluation of many hypothetical placements on one game.
+
+evaluate_placements() traces N candidate boards (the live board plus one
+placed or removed piece each) together as NumPy array operations over an
+(N, board_size * board_size) array of piece codes. NumPy is optional: without
+it the call falls back to evaluate_placements_reference(), which traces each
+candidate with the single-board LightEngine and is the reference the batched
+tracer is checked against.
+
+Both return {'territory': (N, size, size) player bitmasks per cell (bit p set
+when player p lights the cell), 'base_scores': (N, players)} - NumPy arrays
+from the batched path, nested lists from the reference path.
+"""
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+from light_engine import (CODE_KIND, CODE_TRANSITIONS, DIRECTION_IDS, DX, DY, EMPTY,
+                          PIECE_KINDS, PORTAL, cells_mask, controller_masks, piece_code,
+                          popcount, solo_masks)
+
+
+def candidate_codes(game, candidates, player_idx=None):
+    """Resolve (x, y, piece_type, rotation) candidates into (cell id, piece code) pairs.
+
+    A piece_type of None removes whatever is on the cell instead.
+    """
+    if player_idx is None:
+        player_idx = game.current_player
+
+    codes = []
+    for x, y, piece_type, rotation in candidates:
+        if piece_type is None:
+            code = EMPTY
+        else:
+            code = piece_code(PIECE_KINDS[piece_type], player_idx, rotation // 90 % 4)
+        codes.append((y * game.board_size + x, code))
+    return codes
+
+
+# Upper bound on the per-state arrays of one batch (candidates * players * 4 * cells)
+MAX_BATCH_STATES = 1 << 24
+
+
+def evaluate_placements(game, candidates, player_idx=None):
+    """Trace every candidate board in one batch; falls back to the reference without NumPy"""
+    if np is None:
+        return evaluate_placements_reference(game, candidates, player_idx)
+
+    size = game.board_size
+    num_cells = size * size
+    num_players = len(game.players)
+    codes = candidate_codes(game, candidates, player_idx)
+    count = len(codes)
+
+    boards = np.tile(np.frombuffer(bytes(game.board.cells), dtype=np.uint8), (count, 1))
+    if count:
+        cells, values = zip(*codes)
+        boards[np.arange(count), list(cells)] = values
+
+    # Large boards are traced a slice of candidates at a time to bound memory
+    lit = np.zeros((count, num_players, num_cells), dtype=bool)
+    chunk = max(1, MAX_BATCH_STATES // (max(num_players, 1) * 4 * num_cells))
+    for start in range(0, count, chunk):
+        _trace_batch(game, boards[start:start + chunk], lit[start:start + chunk])
+
+    bits = (1 << np.arange(num_players, dtype=np.uint8))[None, :, None]
+    territory = (lit * bits).sum(axis=1, dtype=np.uint8).reshape(count, size, size)
+
+    # Amplifier tiles are worth 3 instead of 1
+    solo = lit & (lit.sum(axis=1) == 1)[:, None, :]
+    amplifiers = np.zeros(num_cells, dtype=bool)
+    for x, y in game.amplifier_tiles:
+        amplifiers[y * size + x] = True
+    base_scores = solo.sum(axis=2) + 2 * (solo & amplifiers).sum(axis=2)
+
+    return {'territory': territory, 'base_scores': base_scores}
+
+
+def evaluate_placements_reference(game, candidates, player_idx=None):
+    """Trace each candidate board one at a time with the single-board engine"""
+    size = game.board_size
+    amplifier_mask = cells_mask(game.amplifier_tiles, size)
+    snapshot = game.board.copy()
+    result = {'territory': [], 'base_scores': []}
+
+    for cell, code in candidate_codes(game, candidates, player_idx):
+        view = snapshot.copy()
+        view.cells[cell] = code
+        player_masks = game.engine.trace(view)['player_masks']
+
+        territory = controller_masks(player_masks, size)
+        solo = solo_masks(player_masks)
+        result['territory'].append([territory[row * size:(row + 1) * size] for row in range(size)])
+        # Amplifier tiles are worth 3 instead of 1
+        result['base_scores'].append([popcount(mask) + 2 * popcount(mask & amplifier_mask) for mask in solo])
+
+    return result
+
+
+_tables = {}
+
+
+def _transition_tables():
+    """CODE_TRANSITIONS as a (256, 4, 3) array padded with -1, plus a portal flag per code"""
+    if not _tables:
+        outgoing = np.full((256, 4, 3), -1, dtype=np.int8)
+        for code, row in enumerate(CODE_TRANSITIONS):
+            for direction, directions in enumerate(row):
+                outgoing[code, direction, :len(directions)] = directions
+        _tables['outgoing'] = outgoing
+        _tables['portal'] = np.array([kind == PORTAL for kind in CODE_KIND])
+        _tables['dx'] = np.array(DX, dtype=np.int32)
+        _tables['dy'] = np.array(DY, dtype=np.int32)
+    return _tables
+
+
+def _trace_batch(game, boards, lit):
+    """Advance every beam of every candidate board one cell per wave.
+
+    Like the single-board tracer this walks (cell, incoming direction)
+    states: a beam entering a (board, player, direction, cell) state that
+    has already been reached is dropped, since everything after it has
+    already been traced. That keeps the frontier small and bounds the number
+    of waves by the number of states.
+    """
+    tables = _transition_tables()
+    outgoing, is_portal, dx, dy = tables['outgoing'], tables['portal'], tables['dx'], tables['dy']
+
+    size = game.board_size
+    num_cells = size * size
+    count, num_players = lit.shape[0], lit.shape[1]
+
+    # By portal owner (code >> 5) and cell: a portal only teleports from a cell of its owner's pair
+    portal_exits = np.full((8, num_cells), -1, dtype=np.int32)
+    for owner, pair in game.portal_pairs.items():
+        (ax, ay), (bx, by) = pair['portal_a'], pair['portal_b']
+        portal_exits[owner, ay * size + ax] = by * size + bx
+        portal_exits[owner, by * size + bx] = ay * size + ax
+
+    sources = [s for s in game.light_sources if s['player'] not in game.disconnected_players]
+    if not count or not sources:
+        return
+
+    candidate = np.repeat(np.arange(count, dtype=np.int64), len(sources))
+    player = np.tile(np.array([s['player'] for s in sources], dtype=np.int64), count)
+    direction = np.tile(np.array([DIRECTION_IDS[s['direction']] for s in sources], dtype=np.int64), count)
+    x = np.tile(np.array([s['x'] for s in sources], dtype=np.int64), count) + dx[direction]
+    y = np.tile(np.array([s['y'] for s in sources], dtype=np.int64), count) + dy[direction]
+
+    seen = np.zeros(count * num_players * 4 * num_cells, dtype=bool)
+    lit_flat = lit.reshape(-1)
+
+    while candidate.size:
+        on_board = (x >= 0) & (x < size) & (y >= 0) & (y < size)
+        candidate, player, direction, x, y = (a[on_board] for a in (candidate, player, direction, x, y))
+
+        cell = y * size + x
+        state = ((candidate * num_players + player) * 4 + direction) * num_cells + cell
+
+        # Keep one beam per state that has not been reached before
+        state, keep = np.unique(state, return_index=True)
+        new = ~seen[state]
+        state, keep = state[new], keep[new]
+        if not keep.size:
+            break
+
+        candidate, player, direction, x, y, cell = (a[keep] for a in (candidate, player, direction, x, y, cell))
+        seen[state] = True
+        lit_flat[(candidate * num_players + player) * num_cells + cell] = True
+
+        code = boards[candidate, cell]
+        out = outgoing[code, direction].astype(np.int64)
+
+        # Portals teleport to their pair and keep going; an unpaired portal stops the beam
+        origin_x, origin_y = x, y
+        portal = is_portal[code]
+        if portal.any():
+            exits = portal_exits[code >> 5, cell]
+            out[portal & (exits < 0), 0] = -1
+            jump = portal & (exits >= 0)
+            origin_x = np.where(jump, exits % size, x)
+            origin_y = np.where(jump, exits // size, y)
+
+        next_waves = []
+        for slot in range(3):
+            new_direction = out[:, slot]
+            moving = new_direction >= 0
+            if not moving.any():
+                continue
+            new_direction = new_direction[moving]
+            next_waves.append((
+                candidate[moving], player[moving], new_direction,
+                origin_x[moving] + dx[new_direction], origin_y[moving] + dy[new_direction]
+            ))
+
+        if not next_waves:
+            break
+        candidate, player, direction, x, y = (np.concatenate(parts) for parts in zip(*next_waves))
@@ -0,0 +1,175 @@
+"""Benchmark the light engine on saved boards.
+
+Usage:
+    python bench_engine.py [--games-dir data/games] [--repeat 200] [--random 50] [--batch]
+    python bench_engine.py --scaling [--sizes 16,32,64] [--players 2,4,8]
+
+Every saved game under --games-dir is loaded and fully traced --repeat times.
+When there are no saved games, seeded random mid-game boards are used instead.
+--batch also times evaluating a mirror in every rotation on every empty cell,
+batched (needs NumPy) against one board at a time.
+--scaling instead times a move (place_piece plus the get_state broadcast) on
+random boards of each size and player count, to see how latency grows.
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+import batch_engine
+from game_logic import PrismWarsGame
+from layouts import PLAYER_COLORS
+
+
+def load_saved_boards(games_dir):
+    """Load every saved game that has a board"""
+    games = []
+    if not os.path.isdir(games_dir):
+        return games
+
+    for filename in sorted(os.listdir(games_dir)):
+        if not filename.endswith('.json'):
+            continue
+        with open(os.path.join(games_dir, filename), 'r') as f:
+            game = PrismWarsGame.from_dict(json.load(f))
+        if game.light_sources:
+            games.append(game)
+    return games
+
+
+def random_board(seed, num_players=2, moves=40, board_size=16):
+    """Play random legal placements to build a mid-game board"""
+    rng = random.Random(seed)
+    game = PrismWarsGame(f'BENCH{seed}', num_players, board_size)
+    game.players = [
+        {'id': str(i), 'username': f'Bench {i + 1}', 'color': PLAYER_COLORS[i], 'ready': True}
+        for i in range(num_players)
+    ]
+    game.initialize_board()
+    game.state = 'playing'
+    # Plenty of pieces and energy so the board fills up quickly, and no early finish
+    game.player_energy = [1000 for _ in game.players]
+    game.player_inventory = [{piece: moves for piece in inventory} for inventory in game.player_inventory]
+    game.max_rounds = max(game.max_rounds, moves)
+    game.win_points = float('inf')
+
+    piece_types = ['mirror', 'mirror', 'mirror', 'splitter', 'prism', 'blocker']
+    for _ in range(moves):
+        if game.state != 'playing':
+            break
+        x = rng.randrange(game.board_size)
+        y = rng.randrange(game.board_size)
+        game.place_piece(x, y, rng.choice(piece_types), rng.choice([0, 90, 180, 270]))
+    return game
+
+
+def bench(games, repeat):
+    """Time full traces and memoized get_state calls; returns ms per call"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for game in games:
+            game.engine.trace()
+    trace_ms = (time.perf_counter() - start) * 1000 / (repeat * len(games))
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for game in games:
+            game.get_state()
+    state_ms = (time.perf_counter() - start) * 1000 / (repeat * len(games))
+
+    return trace_ms, state_ms
+
+
+def bench_batch(games):
+    """Time evaluate_placements over all empty-cell mirror placements; returns ms per board"""
+    timings = {'batched': 0.0, 'single': 0.0}
+    for game in games:
+        candidates = [
+            (x, y, 'mirror', rotation)
+            for y in range(game.board_size)
+            for x in range(game.board_size)
+            if game.board.is_empty(x, y)
+            for rotation in (0, 90, 180, 270)
+        ]
+        start = time.perf_counter()
+        batch_engine.evaluate_placements_reference(game, candidates)
+        timings['single'] += (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        batch_engine.evaluate_placements(game, candidates)
+        timings['batched'] += (time.perf_counter() - start) * 1000
+
+    return {name: total / len(games) for name, total in timings.items()}
+
+
+def bench_scaling(sizes, player_counts, boards=5, moves=20):
+    """Time single moves on mid-game boards of each size; returns {(size, players): ms per move}"""
+    results = {}
+    for size in sizes:
+        for num_players in player_counts:
+            elapsed = 0.0
+            timed = 0
+            for seed in range(boards):
+                # Fill about a sixth of the board before timing
+                game = random_board(seed, num_players, moves=size * size // 6, board_size=size)
+                game.get_state()
+                rng = random.Random(seed)
+                for _ in range(moves):
+                    if game.state != 'playing':
+                        break
+                    x = rng.randrange(size)
+                    y = rng.randrange(size)
+                    if not game.board.is_empty(x, y):
+                        continue
+                    start = time.perf_counter()
+                    game.place_piece(x, y, rng.choice(['mirror', 'splitter', 'prism']), rng.choice([0, 90]))
+                    game.get_state()
+                    elapsed += time.perf_counter() - start
+                    timed += 1
+            results[(size, num_players)] = elapsed * 1000 / max(timed, 1)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Prism Wars light engine')
+    parser.add_argument('--games-dir', default='data/games')
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--random', type=int, default=50, help='random boards to use when none are saved')
+    parser.add_argument('--batch', action='store_true', help='also benchmark batched placement evaluation')
+    parser.add_argument('--scaling', action='store_true', help='benchmark move latency by board size instead')
+    parser.add_argument('--sizes', default='16,32,64')
+    parser.add_argument('--players', default='2,4,8')
+    args = parser.parse_args()
+
+    if args.scaling:
+        sizes = [int(size) for size in args.sizes.split(',')]
+        player_counts = [int(count) for count in args.players.split(',')]
+        results = bench_scaling(sizes, player_counts)
+        print('Move latency (place_piece + get_state), ms')
+        print('size  ' + ''.join(f'{count:>6}p' for count in player_counts))
+        for size in sizes:
+            print(f'{size:<6}' + ''.join(f'{results[(size, count)]:7.2f}' for count in player_counts))
+        return
+
+    games = load_saved_boards(args.games_dir)
+    source = f'{len(games)} saved boards from {args.games_dir}'
+    if not games:
+        games = [random_board(seed, 2 + seed % 3) for seed in range(args.random)]
+        source = f'{len(games)} random boards'
+
+    trace_ms, state_ms = bench(games, args.repeat)
+    print(f'Boards:          {source}')
+    print(f'Full trace:      {trace_ms:.3f} ms')
+    print(f'get_state():     {state_ms:.3f} ms')
+
+    if args.batch:
+        if batch_engine.np is None:
+            print('Batch:           NumPy is not installed, skipping')
+            return
+        for name, ms in bench_batch(games).items():
+            print(f'{"Batch " + name + ":":<17}{ms:.3f} ms per board')
+
+
+if __name__ == '__main__':
+    main()
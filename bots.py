@@ -0,0 +1,382 @@
+"""Computer players.
+
+A bot seat is an ordinary player whose dict has a 'bot' key naming its
+difficulty. On a bot's turn the server hands a copy of the game (to_dict())
+to a BotPool worker, which rebuilds it and searches for a move within the
+difficulty's CPU budget. The live game is never touched by the search; the
+app applies the chosen move through the same methods as a player's socket
+events.
+
+The search is depth-limited alpha-beta with iterative deepening, in the
+"paranoid" form for more than two players: every other player is assumed to
+play against the bot. Positions are walked with make_move/unmake_move and
+scored with calculate_detailed_scores; a position reached again, by another
+move order or on the next deepening, is looked up by its Zobrist hash
+instead. Placements are only considered on cells on or next
+to a beam, and are ranked cheaply first (one batched trace with NumPy) so the
+most promising moves are searched before the budget runs out. Portals are
+left to human players.
+"""
+import concurrent.futures
+import copy
+import multiprocessing
+import random
+import threading
+import time
+
+import batch_engine
+import previews
+from game_logic import PrismWarsGame
+from light_engine import PIECE_KINDS, mask_cells
+
+# budget: CPU seconds per move; candidates: moves searched per player after ranking;
+# depth: deepest search in plies; choices: pick at random among this many best moves
+DIFFICULTIES = {
+    'easy': {'budget': 0.05, 'candidates': 6, 'depth': 1, 'choices': 3},
+    'medium': {'budget': 0.15, 'candidates': 10, 'depth': 2, 'choices': 1},
+    'hard': {'budget': 0.4, 'candidates': 16, 'depth': 3, 'choices': 1}
+}
+
+# Points one unit of energy is worth, so bots neither hoard energy nor waste it
+ENERGY_WEIGHT = 0.1
+
+
+class _OutOfTime(Exception):
+    pass
+
+
+def candidate_moves(game, player_idx):
+    """Placements next to a beam and pickups a player could make right now, unranked"""
+    size = game.board_size
+    near_beams = previews.beam_neighbourhood_mask(game)
+    legal = game.legal_moves(player_idx)
+    moves = []
+
+    for piece_type in PIECE_KINDS:
+        if piece_type == 'portal':
+            continue
+        distinct, _ = previews.rotation_classes(piece_type)
+        for x, y in mask_cells(legal['place'][piece_type] & near_beams, size):
+            moves.extend(('place', x, y, piece_type, quarter_turns * 90) for quarter_turns in distinct)
+
+    moves.extend(('pickup', x, y) for x, y in mask_cells(legal['pickup'], size))
+    return moves
+
+
+class _Search:
+    """Time-bounded search of one game copy, mutated in place with make_move/unmake_move"""
+
+    def __init__(self, game, player_idx, settings, deadline, rng):
+        self.game = game
+        self.player_idx = player_idx
+        self.settings = settings
+        self.deadline = deadline
+        self.rng = rng
+        self.nodes = 0
+        self._step = 0.0        # CPU seconds of the slowest evaluation so far
+        self._replies = {}      # player index -> ranked moves, computed once per search
+        self._values = {}       # (position hash, player index) -> evaluate() result
+
+    def check_time(self):
+        """Stop when the next evaluation could no longer finish within the budget"""
+        if time.thread_time() + self._step > self.deadline:
+            raise _OutOfTime
+
+    def evaluate(self, player_idx):
+        """Score lead of a player over the best of the others, plus a little for energy"""
+        self.nodes += 1
+        key = (self.game.position_hash(), player_idx)
+        value = self._values.get(key)
+        if value is not None:
+            return value
+
+        start = time.thread_time()
+        scores = self.game.calculate_detailed_scores()
+        others = [score['total'] for score in scores
+                  if score['player_index'] != player_idx and not score['is_disconnected']]
+        value = (scores[player_idx]['total'] - max(others, default=0) +
+                 ENERGY_WEIGHT * self.game.player_energy[player_idx])
+        self._step = max(self._step, time.thread_time() - start)
+        self._values[key] = value
+        return value
+
+    def replies(self, player_idx):
+        """A player's best-ranked moves, then pass"""
+        if player_idx not in self._replies:
+            ranked = self._rank(player_idx, candidate_moves(self.game, player_idx), self.deadline)
+            self._replies[player_idx] = ranked[:self.settings['candidates']] + [('pass',)]
+        return self._replies[player_idx]
+
+    def rank(self, player_idx, moves, budget=None):
+        """Order moves best first by the player's lead in base territory after them.
+
+        Ranking stops after budget CPU seconds, or at the search's deadline if
+        that comes first; moves it did not reach follow in their given order.
+        Returns the moves and how many of them were ranked.
+        """
+        deadline = self.deadline
+        if budget is not None:
+            deadline = min(deadline, time.thread_time() + budget)
+        ranked = self._rank(player_idx, moves, deadline)
+        reached = set(ranked)
+        return ranked + [move for move in moves if move not in reached], len(ranked)
+
+    def _rank(self, player_idx, moves, deadline):
+        """The moves reached before deadline, best first"""
+        game = self.game
+        ranked = []
+
+        if batch_engine.np is not None:
+            np = batch_engine.np
+            others = [i for i in range(len(game.players)) if i != player_idx and i not in game.disconnected_players]
+            # Small batches keep each step short enough to honour the budget
+            chunk = max(1, 8192 // (game.board_size * game.board_size))
+            for start in range(0, len(moves), chunk):
+                if time.thread_time() + self._step > deadline:
+                    break
+                step_start = time.thread_time()
+                part = moves[start:start + chunk]
+                candidates = [(m[1], m[2], m[3], m[4]) if m[0] == 'place' else (m[1], m[2], None, 0) for m in part]
+                base_scores = game.evaluate_placements(candidates, player_idx)['base_scores']
+                lead = base_scores[:, player_idx] - (base_scores[:, others].max(axis=1) if others else 0)
+                ranked.extend(zip(np.asarray(lead).tolist(), part))
+                self._step = max(self._step, time.thread_time() - step_start)
+        else:
+            for move in moves:
+                if time.thread_time() + self._step > deadline:
+                    break
+                if game.make_move(move)[0]:
+                    try:
+                        ranked.append((self.evaluate(player_idx), move))
+                    finally:
+                        game.unmake_move()
+
+        # Shuffle first so equally ranked moves are not always taken in board order
+        self.rng.shuffle(ranked)
+        ranked.sort(key=lambda scored: scored[0], reverse=True)
+        return [move for _, move in ranked]
+
+    def run(self):
+        """Deepen until the budget runs out; returns (move, deepest completed depth)"""
+        root = self.replies(self.player_idx)
+        choices = self.settings['choices']
+        best = root[:1]
+        completed = 0
+
+        for depth in range(1, self.settings['depth'] + 1):
+            scored = []
+            try:
+                alpha = float('-inf')
+                for move in root:
+                    self.check_time()
+                    if not self.game.make_move(move)[0]:
+                        continue
+                    try:
+                        # Only the best move's value needs to be exact unless the bot picks among several
+                        value = self._search(depth - 1, alpha if choices == 1 else float('-inf'), float('inf'))
+                    finally:
+                        self.game.unmake_move()
+                    scored.append((value, move))
+                    alpha = max(alpha, value)
+            except _OutOfTime:
+                # A partly searched first depth still beats the ranking alone
+                if not completed and scored:
+                    scored.sort(key=lambda item: item[0], reverse=True)
+                    best = [move for _, move in scored[:choices]]
+                break
+
+            scored.sort(key=lambda item: item[0], reverse=True)
+            root = [move for _, move in scored]
+            best = root[:choices]
+            completed = depth
+
+        return (self.rng.choice(best) if best else ('pass',)), completed
+
+    def _search(self, depth, alpha, beta):
+        game = self.game
+        if depth == 0 or game.state != 'playing':
+            return self.evaluate(self.player_idx)
+
+        mover = game.current_player
+        maximizing = mover == self.player_idx
+        best = None
+        for move in self.replies(mover):
+            self.check_time()
+            if not game.make_move(move)[0]:
+                continue
+            try:
+                value = self._search(depth - 1, alpha, beta)
+            finally:
+                game.unmake_move()
+
+            if maximizing:
+                best = value if best is None else max(best, value)
+                alpha = max(alpha, value)
+            else:
+                best = value if best is None else min(best, value)
+                beta = min(beta, value)
+            if alpha >= beta:
+                break
+
+        return self.evaluate(self.player_idx) if best is None else best
+
+
+def choose_move(game, player_idx, difficulty, rng=None, start=None):
+    """Search a private game copy for player_idx's move; returns (move, stats).
+
+    The game is changed during the search and restored afterwards, so it must
+    not be the live game. start is the thread CPU time the budget counts from.
+    """
+    settings = DIFFICULTIES[difficulty]
+    if start is None:
+        start = time.thread_time()
+    search = _Search(game, player_idx, settings, start + settings['budget'], rng or random.Random())
+    move, depth = search.run()
+    return move, {
+        'cpu_ms': (time.thread_time() - start) * 1000,
+        'nodes': search.nodes,
+        'depth': depth
+    }
+
+
+def rank_hints(game, player_idx, count=5, budget=0.25, start=None):
+    """A player's best placements by change in total score, within a CPU budget.
+    
+    As with choose_move, the game must be a private copy.
+    """
+    if start is None:
+        start = time.thread_time()
+    search = _Search(game, player_idx, {}, start + budget, random.Random(0))
+
+    size = game.board_size
+    player_masks = game.engine.current()['player_masks']
+    lit = 0
+    for mask in player_masks:
+        lit |= mask
+    legal = game.legal_moves(player_idx)['place']
+    # Only lit cells can change a beam; the player's own beams first, as they most often gain the most
+    moves = []
+    for cells in (player_masks[player_idx], lit & ~player_masks[player_idx]):
+        for piece_type in PIECE_KINDS:
+            if piece_type == 'portal':
+                continue
+            distinct, _ = previews.rotation_classes(piece_type)
+            for x, y in mask_cells(legal[piece_type] & cells, size):
+                moves.extend(('place', x, y, piece_type, quarter_turns * 90) for quarter_turns in distinct)
+
+    # The batched estimate gets half the budget to order the full rescoring below
+    ranked, _ = search.rank(player_idx, moves, budget / 2)
+
+    base = game.calculate_detailed_scores()[player_idx]['total']
+    scored = []
+    complete = True
+    try:
+        for move in ranked:
+            search.check_time()
+            if not game.make_move(move)[0]:
+                continue
+            try:
+                search.nodes += 1
+                scored.append((game.calculate_detailed_scores()[player_idx]['total'] - base, move))
+            finally:
+                game.unmake_move()
+    except _OutOfTime:
+        complete = False
+
+    scored.sort(key=lambda item: item[0], reverse=True)
+    return {
+        'hints': [{'piece_type': move[3], 'x': move[1], 'y': move[2], 'rotation': move[4], 'delta': delta}
+                  for delta, move in scored[:count]],
+        'scored': len(scored),
+        'candidates': len(moves),
+        'complete': complete,
+        'cpu_ms': (time.thread_time() - start) * 1000,
+        'nodes': search.nodes
+    }
+
+
+def think(game_data, player_idx, difficulty, seed=None):
+    """Worker entry point: rebuild a game from to_dict() data and choose a move for it"""
+    start = time.thread_time()
+    game = PrismWarsGame.from_dict(game_data)
+    return choose_move(game, player_idx, difficulty, random.Random(seed), start)
+
+
+def hint(game_data, player_idx, count, budget):
+    """Worker entry point: rebuild a game from to_dict() data and rank hints for it"""
+    start = time.thread_time()
+    game = PrismWarsGame.from_dict(game_data)
+    return rank_hints(game, player_idx, count, budget, start)
+
+
+class BotPool:
+    """Runs bot and hint searches off the socket handlers' threads and keeps per-search CPU metrics.
+
+    With workers > 0 searches run in that many spawned processes, so bots use
+    other cores and never hold the server's GIL. Spawn rather than fork: the
+    pool is created on the first bot turn, when the server's threads (or
+    green threads under eventlet) may hold locks a forked child would inherit
+    held. Workers only import this module and the game modules it needs; a
+    script that creates a pool and is run directly must keep its start-up
+    side effects out of the '__mp_main__' re-import. With workers = 0 a small
+    thread pool is used instead.
+    """
+
+    def __init__(self, workers=2):
+        self.workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                if self.workers > 0:
+                    self._executor = concurrent.futures.ProcessPoolExecutor(
+                        self.workers, mp_context=multiprocessing.get_context('spawn'))
+                else:
+                    self._executor = concurrent.futures.ThreadPoolExecutor(max(self.workers, 2))
+            return self._executor
+
+    def submit(self, game, player_idx):
+        """Start choosing the move of a bot seat; the future resolves to (move, stats)"""
+        # A deep copy, so neither the pickling nor a thread worker shares the live game's lists
+        snapshot = copy.deepcopy(game.to_dict())
+        difficulty = game.players[player_idx]['bot']
+        return self._get_executor().submit(think, snapshot, player_idx, difficulty)
+
+    def submit_hint(self, game, player_idx, count, budget):
+        """Start ranking hints for a player; the future resolves to rank_hints()'s result"""
+        snapshot = copy.deepcopy(game.to_dict())
+        return self._get_executor().submit(hint, snapshot, player_idx, count, budget)
+
+    def record(self, name, stats, wall_ms, budget):
+        """Add one finished search to the metrics under name, e.g. a difficulty or 'hint'"""
+        budget_ms = budget * 1000
+        with self._lock:
+            metrics = self._metrics.setdefault(name, {
+                'searches': 0, 'cpu_ms': 0.0, 'max_cpu_ms': 0.0, 'wall_ms': 0.0,
+                'nodes': 0, 'over_budget': 0, 'budget_ms': budget_ms
+            })
+            metrics['searches'] += 1
+            metrics['cpu_ms'] += stats['cpu_ms']
+            metrics['max_cpu_ms'] = max(metrics['max_cpu_ms'], stats['cpu_ms'])
+            metrics['wall_ms'] += wall_ms
+            metrics['nodes'] += stats['nodes']
+            if stats['cpu_ms'] > budget_ms:
+                metrics['over_budget'] += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                name: {
+                    'searches': metrics['searches'],
+                    'budget_ms': metrics['budget_ms'],
+                    'mean_cpu_ms': metrics['cpu_ms'] / metrics['searches'],
+                    'max_cpu_ms': metrics['max_cpu_ms'],
+                    'mean_wall_ms': metrics['wall_ms'] / metrics['searches'],
+                    'mean_nodes': metrics['nodes'] / metrics['searches'],
+                    'over_budget': metrics['over_budget']
+                }
+                for name, metrics in self._metrics.items()
+            }
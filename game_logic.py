@@ -1,16 +1,26 @@
 from datetime import datetime
+import hashlib
 import random
 import time
 import json
+import batch_engine
+import layouts
+import previews
+import state_sync
+import transpositions
+import zobrist
+from light_engine import (LightEngine, Board, DIRECTION_IDS, DX, DY, PIECE_KINDS, popcount, cells_mask,
+                          solo_masks, region_masks, controller_masks, controller_grid, occupied_mask,
+                          pickup_mask, mask_cells)
 
 class PrismWarsGame:
-    def __init__(self, game_id, max_players=2):
+    def __init__(self, game_id, max_players=2, board_size=layouts.CLASSIC_BOARD_SIZE):
         self.game_id = game_id
         self.max_players = max_players
         self.players = []
         self.state = 'waiting'
-        self.board_size = 16  # Changed from 15 to 16 for perfect center
-        self.board = []
+        self.board_size = board_size  # Even sizes have a 2x2 center
+        self.board = Board(self.board_size)
         self.light_sources = []
         self.current_player = 0
         self.round_number = 1
@@ -29,6 +39,7 @@ class PrismWarsGame:
         self.amplifier_tiles = []
         self.protected_zones = []
         self.blocker_exclusion_zones = []
+        self.zone_masks = {'protected': 0, 'blocker': 0}  # the zones as bitboards, built once per layout
         self.win_points = 75
         self.objectives = []
         self.completed_objectives = []
@@ -66,10 +77,32 @@ class PrismWarsGame:
         
         self.created_at = datetime.now()
         self.started_at = None
+        
+        # Draws amplifier tiles and objectives; a seeded random.Random makes the setup reproducible
+        self.rng = random
+        
+        # Bumped by every mutator; derived views are memoized against it
+        self.state_version = 0
+        self._scores_version = None
+        self._detailed_scores = None
+        self._preview_bundle_key = None
+        self._preview_bundle = None
+        self.preview_cache = previews.PreviewCache()
+        
+        # The last state sent to clients, so updates only carry what changed
+        self.state_sync = state_sync.StateSync()
+        
+        # make_move/unmake_move history and the position hash they keep up to date
+        self._undo_log = []
+        self._position_hash = None
+        self._hash_version = None
+        
+        # Beam traversal shared by territory, scores and segments
+        self.engine = LightEngine(self)
     
     def initialize_board(self):
         """Initialize the game board and light sources"""
-        self.board = [[None for _ in range(self.board_size)] for _ in range(self.board_size)]
+        self.board = Board(self.board_size)
         
         self.player_inventory = []
         for _ in self.players:
@@ -90,6 +123,7 @@ class PrismWarsGame:
         self._generate_amplifier_tiles()
         self._create_protected_zones()
         self._create_blocker_exclusion_zones()
+        self._build_zone_masks()
         self._assign_objectives()
         
         self.completed_objectives = [set() for _ in self.players]
@@ -101,73 +135,29 @@ class PrismWarsGame:
         self.pending_disconnects = {}
         
         self.started_at = datetime.now()
+        self.engine.reset()
+        self._bump_version()
+    
+    def _bump_version(self, changed_cells=()):
+        """Mark derived views as stale; changed_cells lets the engine re-trace only the beams crossing them"""
+        self.state_version += 1
+        self.preview_cache.clear()
+        if changed_cells:
+            self.engine.invalidate_cells(changed_cells)
     
     def _initialize_light_sources(self):
-        """Place light sources - 2 per player"""
-        self.light_sources = []
-        
-        if len(self.players) == 2:
-            positions_p0 = [(3, 0, 'down'), (0, 3, 'right')]
-            positions_p1 = [(12, 15, 'up'), (15, 12, 'left')]
-            
-            for x, y, direction in positions_p0:
-                self.light_sources.append({
-                    'x': x if direction in ['up', 'down'] else (-1 if direction == 'right' else self.board_size),
-                    'y': y if direction in ['left', 'right'] else (-1 if direction == 'down' else self.board_size),
-                    'direction': direction,
-                    'player': 0,
-                    'color': self.players[0]['color']
-                })
-            
-            for x, y, direction in positions_p1:
-                self.light_sources.append({
-                    'x': x if direction in ['up', 'down'] else (-1 if direction == 'right' else self.board_size),
-                    'y': y if direction in ['left', 'right'] else (-1 if direction == 'down' else self.board_size),
-                    'direction': direction,
-                    'player': 1,
-                    'color': self.players[1]['color']
-                })
-        
-        elif len(self.players) == 3:
-            all_positions = [
-                [(3, 0, 'down'), (0, 4, 'right')],
-                [(15, 6, 'left'), (11, 15, 'up')],
-                [(0, 11, 'right'), (4, 15, 'up')]
-            ]
-            for i in range(3):
-                for x, y, direction in all_positions[i]:
-                    self.light_sources.append({
-                        'x': x if direction in ['up', 'down'] else (-1 if direction == 'right' else self.board_size),
-                        'y': y if direction in ['left', 'right'] else (-1 if direction == 'down' else self.board_size),
-                        'direction': direction,
-                        'player': i,
-                        'color': self.players[i]['color']
-                    })
-        
-        elif len(self.players) == 4:
-            all_positions = [
-                [(3, 0, 'down'), (0, 3, 'right')],
-                [(12, 0, 'down'), (15, 3, 'left')],
-                [(3, 15, 'up'), (0, 12, 'right')],
-                [(12, 15, 'up'), (15, 12, 'left')]
-            ]
-            for i in range(4):
-                for x, y, direction in all_positions[i]:
-                    self.light_sources.append({
-                        'x': x if direction in ['up', 'down'] else (-1 if direction == 'right' else self.board_size),
-                        'y': y if direction in ['left', 'right'] else (-1 if direction == 'down' else self.board_size),
-                        'direction': direction,
-                        'player': i,
-                        'color': self.players[i]['color']
-                    })
+        """Place light sources - 2 per player, laid out for the board size"""
+        self.light_sources = layouts.light_sources(self.board_size, self.players)
     
     def _generate_amplifier_tiles(self):
-        """Generate 5 random amplifier tiles"""
+        """Generate random amplifier tiles - 5 on a 16x16 board, more on larger ones"""
         self.amplifier_tiles = []
+        count = layouts.amplifier_count(self.board_size)
+        margin = layouts.amplifier_margin(self.board_size)
         attempts = 0
-        while len(self.amplifier_tiles) < 5 and attempts < 100:
-            x = random.randint(4, self.board_size - 5)
-            y = random.randint(4, self.board_size - 5)
+        while len(self.amplifier_tiles) < count and attempts < 20 * count:
+            x = self.rng.randint(margin, self.board_size - 1 - margin)
+            y = self.rng.randint(margin, self.board_size - 1 - margin)
             if (x, y) not in self.amplifier_tiles:
                 self.amplifier_tiles.append((x, y))
             attempts += 1
@@ -214,28 +204,25 @@ class PrismWarsGame:
                 if 0 <= px < self.board_size and 0 <= py < self.board_size:
                     self.blocker_exclusion_zones.append((px, py))
 
+    def _build_zone_masks(self):
+        """Bitboards of the protected and blocker exclusion zones, which only change with the layout"""
+        self.zone_masks = {
+            'protected': cells_mask(self.protected_zones, self.board_size),
+            'blocker': cells_mask(self.blocker_exclusion_zones, self.board_size)
+        }
+
     def _is_border_cell(self, x, y):
         """Check if a cell is on the border (edge)"""
         return (x == 0 or x == self.board_size - 1 or 
                 y == 0 or y == self.board_size - 1)
 
-    def _get_portal_exit_direction(self, entry_direction):
-        """Light exits portal in same direction it entered"""
-        return entry_direction
-    
     def _assign_objectives(self):
         """Assign objectives to each player"""
-        all_objectives = [
-            {'id': 'corners', 'name': 'Control All 4 Corners', 'points': 15, 'description': 'Control all 4 corner cells'},
-            {'id': 'center', 'name': 'Dominate Center', 'points': 12, 'description': 'Control the center 2x2 area'},
-            {'id': 'border_dominance', 'name': 'Border Dominance', 'points': 12, 'description': 'Control 15+ edge cells'},
-            {'id': 'amplifier_control', 'name': 'Power Surge', 'points': 12, 'description': 'Control 3+ amplifier tiles'},
-            {'id': 'expansionist', 'name': 'Expansionist', 'points': 12, 'description': 'Control 5+ cells in each quadrant'},
-        ]
+        all_objectives = layouts.objective_definitions(self.board_size)
     
         self.objectives = []
         for _ in self.players:
-            player_objectives = random.sample(all_objectives, 2)
+            player_objectives = self.rng.sample(all_objectives, 2)
             self.objectives.append(player_objectives)
     
     def update_heartbeat(self, player_idx):
@@ -264,7 +251,10 @@ class PrismWarsGame:
     def handle_reconnection(self, player_idx):
         """Handle player reconnection"""
         self.missed_turns[player_idx] = 0
-        self.disconnected_players.discard(player_idx)
+        if player_idx in self.disconnected_players:
+            self.disconnected_players.discard(player_idx)
+            self.engine.invalidate_player(player_idx)
+        self._bump_version()
         
         if player_idx in self.pending_disconnects:
             del self.pending_disconnects[player_idx]
@@ -293,9 +283,11 @@ class PrismWarsGame:
         current_player_idx = self.current_player
         
         self.missed_turns[current_player_idx] = self.missed_turns.get(current_player_idx, 0) + 1
+        self._bump_version()
         
         if self.missed_turns[current_player_idx] >= 3:
             self.disconnected_players.add(current_player_idx)
+            self.engine.invalidate_player(current_player_idx)
             
             active_players = [i for i in range(len(self.players)) if i not in self.disconnected_players]
             if len(active_players) <= 1:
@@ -332,25 +324,17 @@ class PrismWarsGame:
         if x < 0 or x >= self.board_size or y < 0 or y >= self.board_size:
             return False, "Invalid coordinates"
 
-        piece = self.board[y][x]
-        if piece is None:
-            return False, "No piece to pick up"
-        
-        if piece['type'] == 'portal':
-            return False, "Cannot pick up portals - they are permanent once placed"
+        # legal_moves() decides; the checks below only explain a refusal
+        if not self._pickup_mask(player_idx) >> (y * self.board_size + x) & 1:
+            return False, self._pickup_error(x, y, player_idx)
         
-        if piece['player'] != player_idx:
-            return False, "Can only pick up your own pieces"
-        
-        if not self.can_afford_action(player_idx, 'pickup'):
-            return False, f"Not enough energy (need {self.pickup_cost})"
-        
-        piece_type = piece['type']
+        piece_type = self.board.piece_type(x, y)
         self.player_inventory[player_idx][piece_type] += 1
         
-        self.board[y][x] = None
+        self.board.remove(x, y)
         
         self.spend_energy(player_idx, self.pickup_cost)
+        self._bump_version([(x, y)])
         
         return True, "Piece picked up"
 
@@ -359,39 +343,26 @@ class PrismWarsGame:
         if x < 0 or x >= self.board_size or y < 0 or y >= self.board_size:
             return False, "Invalid coordinates"
 
-        # Portal-specific validation
+        player_idx = self.current_player
+        
+        # legal_moves() decides; the checks below only explain a refusal
+        if not self._placement_mask(piece_type, player_idx) >> (y * self.board_size + x) & 1:
+            return False, self._placement_error(x, y, piece_type, player_idx)
+        
         if piece_type == 'portal':
-            if not self._is_border_cell(x, y):
-                return False, "Portals can only be placed on border edges"
-            
-            player_idx = self.current_player
-            
             # Check if there's a portal placement in progress
             if self.portal_placement_in_progress:
-                # Placing second portal
-                if self.portal_placement_in_progress['player'] != player_idx:
-                    return False, "Another player's portal placement in progress"
-                
                 first_portal = self.portal_placement_in_progress['first_portal']
                 
-                # Can't place both portals on same cell
-                if (x, y) == first_portal:
-                    return False, "Cannot place both portals on same cell"
-                
-                # Place second portal (NO energy cost for second portal)
-                self.board[y][x] = {
-                    'type': 'portal',
-                    'player': player_idx,
-                    'rotation': 0,
-                    'color': self.players[player_idx]['color'],
-                    'pair_id': player_idx
-                }
+                # Place second portal (NO energy cost for second portal);
+                # both portals are paired by their owner
+                self.board.place(x, y, 'portal', player_idx)
                 
-                # Update first portal's data
-                fy, fx = first_portal[1], first_portal[0]
-                self.board[fy][fx]['pair_id'] = player_idx
-                
-                # Store portal pair
+                # Store portal pair; the portals of an earlier pair are left unpaired
+                changed_cells = [first_portal, (x, y)]
+                if player_idx in self.portal_pairs:
+                    old_pair = self.portal_pairs[player_idx]
+                    changed_cells.extend((old_pair['portal_a'], old_pair['portal_b']))
                 self.portal_pairs[player_idx] = {
                     'portal_a': first_portal,
                     'portal_b': (x, y)
@@ -405,28 +376,15 @@ class PrismWarsGame:
                 
                 self.last_piece_placement = (x, y, player_idx)
                 self.missed_turns[player_idx] = 0
+                self._bump_version(changed_cells)
                 
                 # End turn after second portal
                 self.next_turn()
                 
                 return True, "Portal pair placed successfully"
             else:
-                # Placing first portal - check inventory and energy
-                if self.player_inventory[player_idx]['portal'] <= 0:
-                    return False, "No portal pairs remaining in inventory"
-                
-                if not self.can_afford_action(player_idx, 'place', 'portal'):
-                    cost = self.piece_costs['portal']
-                    return False, f"Not enough energy (need {cost}, have {self.player_energy[player_idx]})"
-                
                 # Place first portal
-                self.board[y][x] = {
-                    'type': 'portal',
-                    'player': player_idx,
-                    'rotation': 0,
-                    'color': self.players[player_idx]['color'],
-                    'pair_id': player_idx
-                }
+                self.board.place(x, y, 'portal', player_idx)
                 
                 # Spend energy ONCE for the pair
                 cost = self.piece_costs['portal']
@@ -439,38 +397,13 @@ class PrismWarsGame:
                 }
                 
                 self.last_piece_placement = (x, y, player_idx)
+                self._bump_version([(x, y)])
                 
                 # DO NOT end turn - let them place second portal
                 return True, "First portal placed - click on another border cell to place second portal"
         
-        # Non-portal pieces (original logic)
-        if piece_type == 'blocker' and (x, y) in self.blocker_exclusion_zones:
-            return False, "Blockers cannot be placed within 3 cells of light sources"
-        
-        if piece_type != 'blocker' and (x, y) in self.protected_zones:
-            return False, "Cannot place in protected zone near light sources"
-        
-        if self.board[y][x] is not None:
-            return False, "Cell already occupied"
-        
-        if piece_type not in ['mirror', 'prism', 'blocker', 'splitter']:
-            return False, "Invalid piece type"
-        
-        player_idx = self.current_player
-        
-        if self.player_inventory[player_idx][piece_type] <= 0:
-            return False, f"No {piece_type}s remaining in inventory"
-        
-        if not self.can_afford_action(player_idx, 'place', piece_type):
-            cost = self.piece_costs[piece_type]
-            return False, f"Not enough energy (need {cost}, have {self.player_energy[player_idx]})"
-        
-        self.board[y][x] = {
-            'type': piece_type,
-            'player': player_idx,
-            'rotation': rotation,
-            'color': self.players[player_idx]['color']
-        }
+        # Non-portal pieces end the turn
+        self.board.place(x, y, piece_type, player_idx, rotation)
         
         self.player_inventory[player_idx][piece_type] -= 1
         
@@ -479,6 +412,7 @@ class PrismWarsGame:
         
         self.last_piece_placement = (x, y, player_idx)
         self.missed_turns[player_idx] = 0
+        self._bump_version([(x, y)])
         
         self.next_turn()
         
@@ -495,7 +429,7 @@ class PrismWarsGame:
         # Remove first portal from board
         first_portal = self.portal_placement_in_progress['first_portal']
         fx, fy = first_portal
-        self.board[fy][fx] = None
+        self.board.remove(fx, fy)
         
         # Refund energy
         cost = self.piece_costs['portal']
@@ -503,6 +437,7 @@ class PrismWarsGame:
         
         # Clear in-progress state
         self.portal_placement_in_progress = None
+        self._bump_version([first_portal])
         
         return True, "Portal placement cancelled"
     
@@ -521,6 +456,7 @@ class PrismWarsGame:
         self.gain_energy(self.current_player)
         
         self.turn_start_time = time.time()
+        self._bump_version()
         
         # Get active players (non-disconnected)
         active_players = [i for i in range(len(self.players)) if i not in self.disconnected_players]
@@ -540,388 +476,319 @@ class PrismWarsGame:
                         self.end_game()
                         break
     
-    def calculate_light_paths(self):
-        """Calculate all light beam paths and territory control"""
-        territory = [[set() for _ in range(self.board_size)] for _ in range(self.board_size)]
-        
-        for source in self.light_sources:
-            if source['player'] not in self.disconnected_players:
-                self._trace_light_beam(source, territory)
+    def make_move(self, move):
+        """Play a move so that unmake_move() can take it back, for search without copying the game.
+        
+        move is ('place', x, y, piece_type, rotation), ('pickup', x, y) or
+        ('pass',), checked and applied by the same rules as the socket
+        handlers. Only the fields a move can change are saved, and the
+        position hash is updated from them rather than recomputed.
+        """
+        if self.state != 'playing':
+            return False, "Game is not in progress"
+        
+        action = move[0]
+        if action in ('place', 'pickup'):
+            x, y = move[1], move[2]
+            if x < 0 or x >= self.board_size or y < 0 or y >= self.board_size:
+                return False, "Invalid coordinates"
+            cell = y * self.board_size + x
+        elif action == 'pass':
+            cell = None
+        else:
+            return False, f"Unknown move {action}"
         
-        return territory
+        old_hash = self.position_hash()
+        player_idx = self.current_player
+        old_code = self.board.cells[cell] if cell is not None else None
+        old_inventory = dict(self.player_inventory[player_idx])
+        old_energy = list(self.player_energy)
+        old_round = self.round_number
+        old_portal = self.portal_placement_in_progress
+        undo = (cell, old_code, player_idx, old_inventory, old_energy, old_round, old_portal,
+                self.portal_pairs.get(player_idx), self.last_piece_placement, self.missed_turns.get(player_idx),
+                self.state, self.winner, self.turn_start_time, old_hash)
+        
+        if action == 'place':
+            success, message = self.place_piece(x, y, move[3], move[4])
+        elif action == 'pickup':
+            success, message = self.pickup_piece(x, y, player_idx)
+        else:
+            self.next_turn()
+            success, message = True, "Turn passed"
+        
+        if not success:
+            return success, message
+        
+        new_hash = old_hash
+        if cell is not None:
+            new_hash ^= zobrist.cell_key(cell, old_code) ^ zobrist.cell_key(cell, self.board.cells[cell])
+        inventory = self.player_inventory[player_idx]
+        for piece_type, count in old_inventory.items():
+            if inventory[piece_type] != count:
+                new_hash ^= (zobrist.inventory_key(player_idx, piece_type, count) ^
+                             zobrist.inventory_key(player_idx, piece_type, inventory[piece_type]))
+        for i, energy in enumerate(old_energy):
+            if self.player_energy[i] != energy:
+                new_hash ^= zobrist.energy_key(i, energy) ^ zobrist.energy_key(i, self.player_energy[i])
+        if self.current_player != player_idx:
+            new_hash ^= zobrist.key(zobrist.TURN, player_idx) ^ zobrist.key(zobrist.TURN, self.current_player)
+        if self.round_number != old_round:
+            new_hash ^= zobrist.key(zobrist.ROUND, old_round) ^ zobrist.key(zobrist.ROUND, self.round_number)
+        if self.portal_placement_in_progress != old_portal:
+            new_hash ^= (zobrist.portal_key(old_portal, self.board_size) ^
+                         zobrist.portal_key(self.portal_placement_in_progress, self.board_size))
+        
+        self._undo_log.append(undo)
+        self._position_hash = new_hash
+        self._hash_version = self.state_version
+        return success, message
+    
+    def unmake_move(self):
+        """Take back the last move played with make_move()"""
+        if not self._undo_log:
+            return False, "No move to take back"
+        
+        (cell, code, player_idx, inventory, energy, round_number, portal_in_progress, portal_pair,
+         last_piece_placement, missed_turns, state, winner, turn_start_time, old_hash) = self._undo_log.pop()
+        
+        changed_cells = []
+        if cell is not None and self.board.cells[cell] != code:
+            self.board.cells[cell] = code
+            changed_cells.append((cell % self.board_size, cell // self.board_size))
+        
+        self.current_player = player_idx
+        self.player_inventory[player_idx].update(inventory)
+        self.player_energy[:] = energy
+        self.round_number = round_number
+        self.portal_placement_in_progress = portal_in_progress
+        if self.portal_pairs.get(player_idx) != portal_pair:
+            # Beams through the other portal of a pair change with the pairing
+            for pair in (self.portal_pairs.get(player_idx), portal_pair):
+                if pair:
+                    changed_cells.extend((pair['portal_a'], pair['portal_b']))
+            if portal_pair is None:
+                self.portal_pairs.pop(player_idx, None)
+            else:
+                self.portal_pairs[player_idx] = portal_pair
+        self.last_piece_placement = last_piece_placement
+        if missed_turns is None:
+            self.missed_turns.pop(player_idx, None)
+        else:
+            self.missed_turns[player_idx] = missed_turns
+        self.state = state
+        self.winner = winner
+        self.turn_start_time = turn_start_time
+        
+        self._bump_version(changed_cells)
+        self._position_hash = old_hash
+        self._hash_version = self.state_version
+        return True, "Move taken back"
+    
+    def position_hash(self):
+        """64-bit Zobrist hash of the board, turn, inventories and energy"""
+        # Any mutation outside make/unmake bumps the version, so the hash is rebuilt after it.
+        # The version is read first: a mutation that lands meanwhile bumps it again.
+        version = self.state_version
+        if self._hash_version != version:
+            self._position_hash = zobrist.game_hash(self)
+            self._hash_version = version
+        return self._position_hash
+    
+    def calculate_light_paths(self):
+        """Calculate all light beam paths and territory control (memoized, do not mutate)"""
+        return self.engine.current_territory()
     
     def calculate_light_paths_with_preview(self, preview_x, preview_y, preview_piece_type, preview_rotation):
         """Calculate light paths with a preview piece"""
-        original_piece = self.board[preview_y][preview_x]
+        masks = self._preview_masks(preview_x, preview_y, preview_piece_type, preview_rotation)
+        return controller_grid(masks, self.board_size, len(self.players))
+    
+    def get_preview_delta(self, preview_x, preview_y, preview_piece_type, preview_rotation):
+        """Cells whose controllers a preview piece would change, against the committed territory"""
+        version = self.state_version
+        masks = self._preview_masks(preview_x, preview_y, preview_piece_type, preview_rotation)
+        base = controller_masks(self.engine.current()['player_masks'], self.board_size)
         
-        self.board[preview_y][preview_x] = {
-            'type': preview_piece_type,
-            'player': self.current_player,
+        return {
+            'version': version,
+            'x': preview_x,
+            'y': preview_y,
+            'piece_type': preview_piece_type,
             'rotation': preview_rotation,
-            'color': self.players[self.current_player]['color']
+            'changes': previews.territory_delta(base, masks)
         }
-        
-        territory = self.calculate_light_paths()
-        
-        self.board[preview_y][preview_x] = original_piece
-        
-        return territory
     
-    def get_light_beam_segments(self):
-        """Get all light beam segments for animation"""
-        segments = []
-        
-        for source in self.light_sources:
-            if source['player'] not in self.disconnected_players:
-                source_segments = self._trace_beam_segments(source)
-                segments.extend(source_segments)
-        
-        return segments
+    def _preview_masks(self, preview_x, preview_y, preview_piece_type, preview_rotation):
+        """Per-cell controller bitmasks with a preview piece, cached per state version"""
+        key = (self.state_version, preview_x, preview_y, preview_piece_type,
+               previews.canonical_rotation(preview_piece_type, preview_rotation))
+        masks = self.preview_cache.get(key)
+        
+        if masks is None:
+            # Traced on an overlay, so other threads never see the preview piece
+            view = self.board.overlay([(preview_x, preview_y, preview_piece_type,
+                                        self.current_player, preview_rotation)])
+            player_masks = self.engine.trace(view)['player_masks']
+            masks = controller_masks(player_masks, self.board_size)
+            self.preview_cache.put(key, masks)
+        
+        return masks
     
-    def _trace_beam_segments(self, source, visited=None):
-        """Trace beam and return segments"""
-        if visited is None:
-            visited = set()
-        
-        segments = []
-        x, y = source['x'], source['y']
-        direction = source['direction']
-        player = source['player']
-        color = source['color']
-        
-        dx, dy = self._get_direction_delta(direction)
-        x += dx
-        y += dy
-        
-        segment_start = None
-        max_iterations = self.board_size * 2
-        iterations = 0
-        
-        while iterations < max_iterations:
-            iterations += 1
-            
-            if x < 0 or x >= self.board_size or y < 0 or y >= self.board_size:
-                if segment_start:
-                    segments.append({
-                        'x1': segment_start[0],
-                        'y1': segment_start[1],
-                        'x2': x - dx,
-                        'y2': y - dy,
-                        'color': color,
-                        'player': player
-                    })
-                break
-            
-            if (x, y) not in visited:
-                visited.add((x, y))
-                if segment_start is None:
-                    segment_start = (x, y)
-            
-            piece = self.board[y][x]
-            
-            if piece is None:
-                x += dx
-                y += dy
-                continue
-            
-            if segment_start:
-                segments.append({
-                    'x1': segment_start[0],
-                    'y1': segment_start[1],
-                    'x2': x,
-                    'y2': y,
-                    'color': color,
-                    'player': player
-                })
-                segment_start = None
-
-            piece_type = piece['type']
-            
-            if piece_type == 'blocker':
-                break
-
-            elif piece_type == 'portal':
-                # Check if this portal has a pair
-                portal_owner = piece['player']
-                if portal_owner in self.portal_pairs:
-                    pair_data = self.portal_pairs[portal_owner]
-                    portal_a = pair_data['portal_a']
-                    portal_b = pair_data['portal_b']
-                    
-                    # End current segment at portal entrance
-                    if segment_start:
-                        segments.append({
-                            'x1': segment_start[0],
-                            'y1': segment_start[1],
-                            'x2': x,
-                            'y2': y,
-                            'color': color,
-                            'player': player
-                        })
-                    
-                    # Determine exit portal
-                    if (x, y) == portal_a:
-                        exit_portal = portal_b
-                    elif (x, y) == portal_b:
-                        exit_portal = portal_a
-                    else:
-                        break
-                    
-                    # Exit in same direction as entry
-                    exit_direction = self._get_portal_exit_direction(direction)
-                    
-                    # Teleport to exit portal
-                    x, y = exit_portal[0], exit_portal[1]
-                    direction = exit_direction
-                    dx, dy = self._get_direction_delta(direction)
-                    segment_start = (x, y)
-                    x += dx
-                    y += dy
-                else:
-                    break
-            
-            elif piece_type == 'mirror':
-                rotation = piece['rotation']
-                direction = self._reflect_direction(direction, rotation)
-                dx, dy = self._get_direction_delta(direction)
-                segment_start = (x, y)
-                x += dx
-                y += dy
-            
-            elif piece_type == 'prism':
-                rotation = piece['rotation']
-                new_directions = self._prism_split(direction, rotation)
-                
-                for new_dir in new_directions[1:]:
-                    new_source = {
-                        'x': x,
-                        'y': y,
-                        'direction': new_dir,
-                        'player': player,
-                        'color': color
-                    }
-                    segments.extend(self._trace_beam_segments(new_source, visited.copy()))
-                
-                if new_directions:
-                    direction = new_directions[0]
-                    dx, dy = self._get_direction_delta(direction)
-                    segment_start = (x, y)
-                    x += dx
-                    y += dy
-                else:
-                    break
-            
-            elif piece_type == 'splitter':
-                new_directions = self._splitter_split(direction)
-                
-                for new_dir in new_directions[1:]:
-                    new_source = {
-                        'x': x,
-                        'y': y,
-                        'direction': new_dir,
-                        'player': player,
-                        'color': color
-                    }
-                    segments.extend(self._trace_beam_segments(new_source, visited.copy()))
-                
-                if new_directions:
-                    direction = new_directions[0]
-                    dx, dy = self._get_direction_delta(direction)
-                    segment_start = (x, y)
-                    x += dx
-                    y += dy
-                else:
-                    break
-        
-        return segments
+    def prewarm_previews(self):
+        """Cache previews of the mover's likeliest hovers, cells on or next to a beam"""
+        previews.prewarm(self)
     
-    def _trace_light_beam(self, source, territory, visited=None):
-        """Trace a single light beam through the board"""
-        if visited is None:
-            visited = set()
-        
-        x, y = source['x'], source['y']
-        direction = source['direction']
-        player = source['player']
+    def legal_moves(self, player_idx=None):
+        """Every legal target of a player right now as bitboards, following place_piece's and pickup_piece's rules.
         
-        dx, dy = self._get_direction_delta(direction)
-        x += dx
-        y += dy
+        Returns {'place': {piece_type: mask}, 'pickup': mask}, so that zone,
+        border and occupancy tests are one AND per piece type.
+        """
+        if player_idx is None:
+            player_idx = self.current_player
         
-        max_iterations = self.board_size * 2
-        iterations = 0
+        empty = self._empty_mask()
+        place = {piece_type: self._placement_mask(piece_type, player_idx, empty) for piece_type in PIECE_KINDS}
+        return {'place': place, 'pickup': self._pickup_mask(player_idx)}
+    
+    def _empty_mask(self):
+        size = self.board_size
+        return ~occupied_mask(self.board.cells) & ((1 << size * size) - 1)
+    
+    def _placement_mask(self, piece_type, player_idx, empty=None):
+        """Cells where a player may place piece_type right now; the one test place_piece() and legal_moves() share"""
+        if piece_type not in PIECE_KINDS:
+            return 0
+        if empty is None:
+            empty = self._empty_mask()
         
-        while iterations < max_iterations:
-            iterations += 1
-            
-            if x < 0 or x >= self.board_size or y < 0 or y >= self.board_size:
-                break
-            
-            if (x, y) not in visited:
-                territory[y][x].add(player)
-                visited.add((x, y))
-            
-            piece = self.board[y][x]
-            
-            if piece is None:
-                x += dx
-                y += dy
-                continue
-
-            piece_type = piece['type']
-            
-            if piece_type == 'blocker':
-                break
-            
-            elif piece_type == 'portal':
-                # Check if this portal has a pair
-                portal_owner = piece['player']
-                if portal_owner in self.portal_pairs:
-                    pair_data = self.portal_pairs[portal_owner]
-                    portal_a = pair_data['portal_a']
-                    portal_b = pair_data['portal_b']
-                    
-                    # Determine which portal we're at and get the other one
-                    if (x, y) == portal_a:
-                        exit_portal = portal_b
-                    elif (x, y) == portal_b:
-                        exit_portal = portal_a
-                    else:
-                        # Incomplete pair, portal doesn't work
-                        break
-                    
-                    # Exit in same direction as entry
-                    exit_direction = self._get_portal_exit_direction(direction)
-                    
-                    # Teleport to exit portal
-                    x, y = exit_portal[0], exit_portal[1]
-                    direction = exit_direction
-                    dx, dy = self._get_direction_delta(direction)
-                    x += dx
-                    y += dy
-                else:
-                    # No pair, portal doesn't work
-                    break
-
-            elif piece_type == 'mirror':
-                rotation = piece['rotation']
-                direction = self._reflect_direction(direction, rotation)
-                dx, dy = self._get_direction_delta(direction)
-                x += dx
-                y += dy
-            
-            elif piece_type == 'prism':
-                rotation = piece['rotation']
-                new_directions = self._prism_split(direction, rotation)
-                
-                for new_dir in new_directions[1:]:
-                    new_source = {
-                        'x': x,
-                        'y': y,
-                        'direction': new_dir,
-                        'player': player,
-                        'color': source['color']
-                    }
-                    self._trace_light_beam(new_source, territory, visited.copy())
-                
-                if new_directions:
-                    direction = new_directions[0]
-                    dx, dy = self._get_direction_delta(direction)
-                    x += dx
-                    y += dy
-                else:
-                    break
-            
-            elif piece_type == 'splitter':
-                new_directions = self._splitter_split(direction)
-                
-                for new_dir in new_directions[1:]:
-                    new_source = {
-                        'x': x,
-                        'y': y,
-                        'direction': new_dir,
-                        'player': player,
-                        'color': source['color']
-                    }
-                    self._trace_light_beam(new_source, territory, visited.copy())
-                
-                if new_directions:
-                    direction = new_directions[0]
-                    dx, dy = self._get_direction_delta(direction)
-                    x += dx
-                    y += dy
-                else:
-                    break
+        if piece_type == 'portal':
+            in_progress = self.portal_placement_in_progress
+            if in_progress:
+                # Only the second portal of a pair in progress, by its owner
+                allowed = in_progress['player'] == player_idx
+            else:
+                allowed = (self.player_inventory[player_idx]['portal'] > 0 and
+                           self.can_afford_action(player_idx, 'place', 'portal'))
+            return region_masks(self.board_size)['border'] & empty if allowed else 0
+        
+        if (self.player_inventory[player_idx].get(piece_type, 0) <= 0 or
+                not self.can_afford_action(player_idx, 'place', piece_type)):
+            return 0
+        zone = self.zone_masks['blocker' if piece_type == 'blocker' else 'protected']
+        return empty & ~zone
     
-    def _splitter_split(self, direction):
-        """Split light into 2 perpendicular beams"""
-        all_directions = ['up', 'right', 'down', 'left']
-        current_idx = all_directions.index(direction)
+    def _placement_error(self, x, y, piece_type, player_idx):
+        """Why place_piece() refuses a placement _placement_mask() excludes"""
+        if piece_type == 'portal':
+            in_progress = self.portal_placement_in_progress
+            if not self._is_border_cell(x, y):
+                return "Portals can only be placed on border edges"
+            if in_progress and in_progress['player'] != player_idx:
+                return "Another player's portal placement in progress"
+            if in_progress and (x, y) == in_progress['first_portal']:
+                return "Cannot place both portals on same cell"
+            if not self.board.is_empty(x, y):
+                return "Cell already occupied"
+            if self.player_inventory[player_idx]['portal'] <= 0:
+                return "No portal pairs remaining in inventory"
+            cost = self.piece_costs['portal']
+            return f"Not enough energy (need {cost}, have {self.player_energy[player_idx]})"
         
-        left_dir = all_directions[(current_idx - 1) % 4]
-        right_dir = all_directions[(current_idx + 1) % 4]
+        if piece_type == 'blocker' and (x, y) in self.blocker_exclusion_zones:
+            return "Blockers cannot be placed within 3 cells of light sources"
+        if piece_type != 'blocker' and (x, y) in self.protected_zones:
+            return "Cannot place in protected zone near light sources"
+        if not self.board.is_empty(x, y):
+            return "Cell already occupied"
+        if piece_type not in PIECE_KINDS:
+            return "Invalid piece type"
+        if self.player_inventory[player_idx][piece_type] <= 0:
+            return f"No {piece_type}s remaining in inventory"
+        cost = self.piece_costs[piece_type]
+        return f"Not enough energy (need {cost}, have {self.player_energy[player_idx]})"
+    
+    def _pickup_mask(self, player_idx):
+        """Cells a player may pick a piece up from right now"""
+        if not self.can_afford_action(player_idx, 'pickup'):
+            return 0
+        return pickup_mask(self.board.cells, player_idx)
+    
+    def _pickup_error(self, x, y, player_idx):
+        """Why pickup_piece() refuses a pickup _pickup_mask() excludes"""
+        piece_type = self.board.piece_type(x, y)
+        if piece_type is None:
+            return "No piece to pick up"
+        if piece_type == 'portal':
+            return "Cannot pick up portals - they are permanent once placed"
+        if self.board.owner(x, y) != player_idx:
+            return "Can only pick up your own pieces"
+        return f"Not enough energy (need {self.pickup_cost})"
+    
+    def legal_placement_cells(self, piece_type, player_idx=None):
+        """Cells where a player could place a piece right now, following place_piece's rules"""
+        return mask_cells(self.legal_moves(player_idx)['place'].get(piece_type, 0), self.board_size)
+    
+    def get_preview_bundle(self, player_idx=None):
+        """Territory previews for every legal placement of a player (memoized per state version, do not mutate)"""
+        if player_idx is None:
+            player_idx = self.current_player
         
-        return [left_dir, right_dir]
+        key = (self.state_version, player_idx)
+        if self._preview_bundle_key != key:
+            self._preview_bundle = previews.build_preview_bundle(self, player_idx)
+            self._preview_bundle_key = key
+        return self._preview_bundle
+    
+    def evaluate_placements(self, candidates, player_idx=None):
+        """Territory and base scores for many (x, y, piece_type, rotation) placements at once"""
+        return batch_engine.evaluate_placements(self, candidates, player_idx)
+    
+    def get_light_beam_segments(self):
+        """Get all light beam segments for animation (memoized, do not mutate)"""
+        return self.engine.current()['segments']
     
     def _get_direction_delta(self, direction):
         """Get x, y delta for a direction"""
-        deltas = {
-            'up': (0, -1),
-            'down': (0, 1),
-            'left': (-1, 0),
-            'right': (1, 0)
-        }
-        return deltas[direction]
+        direction_id = DIRECTION_IDS[direction]
+        return DX[direction_id], DY[direction_id]
     
-    def _reflect_direction(self, direction, rotation):
-        """Reflect a light beam based on mirror rotation"""
-        if rotation % 180 == 0:
-            reflections = {
-                'up': 'left',
-                'down': 'right',
-                'left': 'up',
-                'right': 'down'
-            }
-        else:
-            reflections = {
-                'up': 'right',
-                'down': 'left',
-                'left': 'down',
-                'right': 'up'
-            }
-        
-        return reflections.get(direction, direction)
-    
-    def _prism_split(self, direction, rotation):
-        """Split light into 3 beams"""
-        all_directions = ['up', 'right', 'down', 'left']
-        current_idx = all_directions.index(direction)
-        
-        straight = direction
-        left_dir = all_directions[(current_idx - 1) % 4]
-        right_dir = all_directions[(current_idx + 1) % 4]
-        
-        return [straight, left_dir, right_dir]
+    def calculate_detailed_scores(self, trace=None):
+        """Calculate detailed scores, memoized per state version unless a trace is given"""
+        if trace is not None:
+            return self._score_trace(trace)
+        
+        version = self.state_version
+        if self._scores_version != version:
+            # Shared with any game that reached the same position and scoring setup
+            position, trace = self.engine.current_with_key()
+            if position is None:
+                detailed_scores = self._score_trace(trace)
+            else:
+                key = transpositions.scores_key(self, position)
+                detailed_scores = transpositions.shared.get(key)
+                if detailed_scores is None:
+                    detailed_scores = self._score_trace(trace)
+                    transpositions.shared.put(key, detailed_scores)
+            self._detailed_scores = detailed_scores
+            self._scores_version = version
+        return self._detailed_scores
     
-    def calculate_detailed_scores(self):
-        """Calculate detailed scores"""
-        territory = self.calculate_light_paths()
+    def _score_trace(self, trace):
+        """Build the per-player score breakdown from a beam trace"""
+        # Cells lit by exactly one player, as one bitboard per player
+        solo = solo_masks(trace['player_masks'])
+        amplifier_mask = cells_mask(self.amplifier_tiles, self.board_size)
         base_scores = {i: 0 for i in range(len(self.players))}
         
-        for y in range(self.board_size):
-            for x in range(self.board_size):
-                controllers = territory[y][x]
-                
-                if len(controllers) == 1:
-                    player = list(controllers)[0]
-                    if player not in self.disconnected_players:
-                        if (x, y) in self.amplifier_tiles:
-                            base_scores[player] += 3
-                        else:
-                            base_scores[player] += 1
+        for player_idx in range(len(self.players)):
+            if player_idx not in self.disconnected_players:
+                # Amplifier tiles are worth 3 instead of 1
+                base_scores[player_idx] = popcount(solo[player_idx]) + 2 * popcount(solo[player_idx] & amplifier_mask)
         
-        combo_scores = self._calculate_combos(territory)
-        objective_scores = self._calculate_objectives(territory)
+        combo_scores = self._calculate_combos(trace)
+        objective_scores = self._calculate_objectives(solo, amplifier_mask)
         
         detailed_scores = []
         for i in range(len(self.players)):
@@ -936,7 +803,7 @@ class PrismWarsGame:
         
         return detailed_scores
 
-    def _calculate_combos(self, territory):
+    def _calculate_combos(self, trace):
         """Calculate combo bonuses - mirror chains and longest beam"""
         combo_scores = []
 
@@ -948,7 +815,7 @@ class PrismWarsGame:
             if player_idx in self.disconnected_players:
                 continue
             
-            player_longest = self._find_longest_beam(player_idx)
+            player_longest = self._find_longest_beam(player_idx, trace)
             if player_longest > longest_beam_length:
                 longest_beam_length = player_longest
                 longest_beam_players = [player_idx]
@@ -971,7 +838,7 @@ class PrismWarsGame:
             }
             
             # Find mirror chains along actual light paths
-            mirror_chains = self._find_mirror_chains_in_light_paths(player_idx)
+            mirror_chains = self._find_mirror_chains_in_light_paths(player_idx, trace)
             for chain_length in mirror_chains:
                 if chain_length >= 3:
                     bonus = 5 * (chain_length - 2)
@@ -988,212 +855,22 @@ class PrismWarsGame:
         
         return combo_scores
 
-    def _find_longest_beam(self, player_idx):
-        """Find the longest uninterrupted beam path for a player"""
-        max_length = 0
-        
-        # Get player's light sources
-        player_sources = [s for s in self.light_sources if s['player'] == player_idx]
-        
-        for source in player_sources:
-            beam_length = self._trace_beam_length(source)
-            if beam_length > max_length:
-                max_length = beam_length
-        
-        return max_length
-    
-    def _trace_beam_length(self, source, visited=None):
-        """Trace a beam and return its length in cells"""
-        if visited is None:
-            visited = set()
-        
-        x, y = source['x'], source['y']
-        direction = source['direction']
-        
-        dx, dy = self._get_direction_delta(direction)
-        x += dx
-        y += dy
-        
-        length = 0
-        max_iterations = self.board_size * 3
-        iterations = 0
-        
-        while iterations < max_iterations:
-            iterations += 1
-            
-            if x < 0 or x >= self.board_size or y < 0 or y >= self.board_size:
-                break
-            
-            if (x, y) in visited:
-                break
-            
-            visited.add((x, y))
-            length += 1
-            
-            piece = self.board[y][x]
-            
-            if piece is None:
-                x += dx
-                y += dy
-                continue
-
-            piece_type = piece['type']
-            
-            if piece_type == 'blocker':
-                break
-
-            elif piece_type == 'portal':
-                # Check if this portal has a pair
-                portal_owner = piece['player']
-                if portal_owner in self.portal_pairs:
-                    pair_data = self.portal_pairs[portal_owner]
-                    portal_a = pair_data['portal_a']
-                    portal_b = pair_data['portal_b']
-                    
-                    # Determine exit portal
-                    if (x, y) == portal_a:
-                        exit_portal = portal_b
-                    elif (x, y) == portal_b:
-                        exit_portal = portal_a
-                    else:
-                        break
-                    
-                    # Exit in same direction as entry
-                    exit_direction = self._get_portal_exit_direction(direction)
-                    
-                    # Teleport to exit portal
-                    x, y = exit_portal[0], exit_portal[1]
-                    direction = exit_direction
-                    dx, dy = self._get_direction_delta(direction)
-                    x += dx
-                    y += dy
-                else:
-                    break
-            
-            elif piece_type == 'mirror':
-                rotation = piece['rotation']
-                direction = self._reflect_direction(direction, rotation)
-                dx, dy = self._get_direction_delta(direction)
-                x += dx
-                y += dy
-            
-            elif piece['type'] in ['prism', 'splitter']:
-                # For split beams, trace each branch and take the longest
-                if piece['type'] == 'prism':
-                    rotation = piece['rotation']
-                    new_directions = self._prism_split(direction, rotation)
-                else:
-                    new_directions = self._splitter_split(direction)
-                
-                max_branch_length = 0
-                for new_dir in new_directions:
-                    new_source = {
-                        'x': x,
-                        'y': y,
-                        'direction': new_dir,
-                        'player': source['player'],
-                        'color': source['color']
-                    }
-                    branch_length = self._trace_beam_length(new_source, visited.copy())
-                    if branch_length > max_branch_length:
-                        max_branch_length = branch_length
-                
-                return length + max_branch_length
-        
-        return length
+    def _find_longest_beam(self, player_idx, trace=None):
+        """Find the longest beam path for a player, in cells from its source"""
+        if trace is None:
+            trace = self.engine.current()
+        
+        lengths = [length for source, length in zip(self.light_sources, trace['beam_lengths'])
+                   if source['player'] == player_idx]
+        return max(lengths, default=0)
     
-    def _find_mirror_chains_in_light_paths(self, player_idx):
+    def _find_mirror_chains_in_light_paths(self, player_idx, trace=None):
         """Find chains of mirrors along actual light beam paths"""
-        chains = []
-        
-        # Get player's light sources
-        player_sources = [s for s in self.light_sources if s['player'] == player_idx]
-        
-        for source in player_sources:
-            chain_length = self._trace_mirror_chain_in_beam(source)
-            if chain_length >= 3:
-                chains.append(chain_length)
-        
-        return chains
-
-    def _trace_mirror_chain_in_beam(self, source, visited=None):
-        """Trace along a light beam and count consecutive mirrors owned by the same player"""
-        if visited is None:
-            visited = set()
-        
-        x, y = source['x'], source['y']
-        direction = source['direction']
-        player = source['player']
-        
-        dx, dy = self._get_direction_delta(direction)
-        x += dx
-        y += dy
-        
-        consecutive_mirrors = 0
-        max_consecutive = 0
-        
-        max_iterations = self.board_size * 2
-        iterations = 0
-        
-        while iterations < max_iterations:
-            iterations += 1
-            
-            if x < 0 or x >= self.board_size or y < 0 or y >= self.board_size:
-                break
-            
-            if (x, y) in visited:
-                break
-            
-            visited.add((x, y))
-            
-            piece = self.board[y][x]
-            
-            if piece is None:
-                # Empty cell - continue beam, don't break chain
-                x += dx
-                y += dy
-                continue
-            
-            if piece['type'] == 'blocker':
-                # Blocker stops beam - save current chain and stop
-                if consecutive_mirrors > max_consecutive:
-                    max_consecutive = consecutive_mirrors
-                break
-            
-            elif piece['type'] == 'mirror':
-                if piece['player'] == player:
-                    # Same player's mirror - increment chain
-                    consecutive_mirrors += 1
-                    rotation = piece['rotation']
-                    direction = self._reflect_direction(direction, rotation)
-                    dx, dy = self._get_direction_delta(direction)
-                    x += dx
-                    y += dy
-                else:
-                    # Different player's mirror - breaks chain, save it, then continue
-                    if consecutive_mirrors > max_consecutive:
-                        max_consecutive = consecutive_mirrors
-                    consecutive_mirrors = 0
-                    rotation = piece['rotation']
-                    direction = self._reflect_direction(direction, rotation)
-                    dx, dy = self._get_direction_delta(direction)
-                    x += dx
-                    y += dy
-            
-            elif piece['type'] in ['prism', 'splitter']:
-                # Prism/splitter breaks the chain - save current chain and stop
-                if consecutive_mirrors > max_consecutive:
-                    max_consecutive = consecutive_mirrors
-                break
-            
-            else:
-                break
-        
-        # Check final chain length
-        if consecutive_mirrors > max_consecutive:
-            max_consecutive = consecutive_mirrors
+        if trace is None:
+            trace = self.engine.current()
         
-        return max_consecutive
+        return [chain_length for source, chain_length in zip(self.light_sources, trace['mirror_chains'])
+                if source['player'] == player_idx and chain_length >= 3]
 
     def _calculate_prism_cascade(self, player_idx, territory):
         """Calculate bonus for prism/splitter usage"""
@@ -1201,9 +878,8 @@ class PrismWarsGame:
         
         for y in range(self.board_size):
             for x in range(self.board_size):
-                piece = self.board[y][x]
-                if piece and piece['player'] == player_idx:
-                    if piece['type'] in ['prism', 'splitter']:
+                if self.board.owner(x, y) == player_idx:
+                    if self.board.piece_type(x, y) in ['prism', 'splitter']:
                         local_territory = 0
                         for dy in range(-2, 3):
                             for dx in range(-2, 3):
@@ -1217,8 +893,10 @@ class PrismWarsGame:
         
         return bonus
     
-    def _calculate_objectives(self, territory):
-        """Calculate objective completion bonuses"""
+    def _calculate_objectives(self, solo, amplifier_mask):
+        """Calculate objective completion bonuses from per-player solo territory bitboards"""
+        regions = region_masks(self.board_size)
+        targets = layouts.objective_targets(self.board_size)
         objective_scores = []
         
         for player_idx in range(len(self.players)):
@@ -1230,55 +908,30 @@ class PrismWarsGame:
                 'completed': [],
                 'total': 0
             }
+            owned = solo[player_idx]
             
             for objective in self.objectives[player_idx]:
                 obj_id = objective['id']
                 completed = False
                 
                 if obj_id == 'corners':
-                    corners = [(0, 0), (self.board_size-1, 0), (0, self.board_size-1), (self.board_size-1, self.board_size-1)]
-                    completed = all(player_idx in territory[y][x] and len(territory[y][x]) == 1 for x, y in corners)
+                    completed = owned & regions['corners'] == regions['corners']
                 
                 elif obj_id == 'center':
-                    # 16x16 board, perfect center is cells (7,7), (8,7), (7,8), (8,8)
-                    center_cells = [(7, 7), (8, 7), (7, 8), (8, 8)]
-                    completed = all(player_idx in territory[y][x] and len(territory[y][x]) == 1 for x, y in center_cells)
+                    # Center 2x2, e.g. (7,7), (8,7), (7,8), (8,8) on a 16x16 board
+                    completed = owned & regions['center'] == regions['center']
 
                 elif obj_id == 'border_dominance':
-                    edge_count = 0
-                    for x in range(self.board_size):
-                        if player_idx in territory[0][x] and len(territory[0][x]) == 1:
-                            edge_count += 1
-                        if player_idx in territory[self.board_size-1][x] and len(territory[self.board_size-1][x]) == 1:
-                            edge_count += 1
-                    for y in range(1, self.board_size-1):
-                        if player_idx in territory[y][0] and len(territory[y][0]) == 1:
-                            edge_count += 1
-                        if player_idx in territory[y][self.board_size-1] and len(territory[y][self.board_size-1]) == 1:
-                            edge_count += 1
-                    completed = edge_count >= 15
+                    # 15+ edge cells on a 16x16 board
+                    completed = popcount(owned & regions['border']) >= targets['border_dominance']
 
                 elif obj_id == 'amplifier_control':
-                    amp_count = sum(1 for x, y in self.amplifier_tiles 
-                                   if player_idx in territory[y][x] and len(territory[y][x]) == 1)
-                    completed = amp_count >= 3
+                    completed = popcount(owned & amplifier_mask) >= targets['amplifier_control']
 
                 elif obj_id == 'expansionist':
-                    # Count cells in each quadrant
-                    quadrant_counts = [0, 0, 0, 0]
-                    for y in range(self.board_size):
-                        for x in range(self.board_size):
-                            if player_idx in territory[y][x] and len(territory[y][x]) == 1:
-                                if x < 8 and y < 8:
-                                    quadrant_counts[0] += 1
-                                elif x >= 8 and y < 8:
-                                    quadrant_counts[1] += 1
-                                elif x < 8 and y >= 8:
-                                    quadrant_counts[2] += 1
-                                else:
-                                    quadrant_counts[3] += 1
-                    # Need 5+ cells in each quadrant
-                    completed = all(count >= 5 for count in quadrant_counts)
+                    # Need 5+ cells in each quadrant on a 16x16 board
+                    completed = all(popcount(owned & quadrant) >= targets['expansionist']
+                                    for quadrant in regions['quadrants'])
 
                 if completed:
                     score['completed'].append(objective)
@@ -1293,9 +946,9 @@ class PrismWarsGame:
         detailed_scores = self.calculate_detailed_scores()
         return {i: score['base_territory'] for i, score in enumerate(detailed_scores)}
     
-    def get_scores(self):
+    def get_scores(self, trace=None):
         """Get current scores for all players with full breakdown"""
-        detailed_scores = self.calculate_detailed_scores()
+        detailed_scores = self.calculate_detailed_scores(trace)
         return [
             {
                 'player': self.players[i]['username'],
@@ -1309,6 +962,7 @@ class PrismWarsGame:
     def force_end_game(self, winner_idx):
         """Force end game due to disconnections"""
         self.state = 'finished'
+        self._bump_version()
         
         if winner_idx is None:
             self.winner = {
@@ -1329,6 +983,7 @@ class PrismWarsGame:
     def end_game(self):
         """End the game and determine winner"""
         self.state = 'finished'
+        self._bump_version()
         detailed_scores = self.calculate_detailed_scores()
         
         active_scores = [(i, score) for i, score in enumerate(detailed_scores) if i not in self.disconnected_players]
@@ -1367,7 +1022,7 @@ class PrismWarsGame:
             'max_players': self.max_players,
             'players': self.players,
             'state': self.state,
-            'board': self.board,
+            'board': self.board.to_rows(self.players),
             'board_size': self.board_size,
             'light_sources': self.light_sources,
             'current_player': self.current_player,
@@ -1397,11 +1052,11 @@ class PrismWarsGame:
     @classmethod
     def from_dict(cls, data):
         """Create game from dictionary"""
-        game = cls(data['game_id'], data['max_players'])
+        game = cls(data['game_id'], data['max_players'], data['board_size'])
         game.players = data['players']
         game.state = data['state']
-        game.board = data['board']
         game.board_size = data['board_size']
+        game.board = Board.from_rows(data['board'], game.board_size)
         game.light_sources = data['light_sources']
         game.current_player = data['current_player']
         game.round_number = data['round_number']
@@ -1412,6 +1067,7 @@ class PrismWarsGame:
         game.amplifier_tiles = [tuple(t) for t in data['amplifier_tiles']]
         game.protected_zones = [tuple(z) for z in data['protected_zones']]
         game.blocker_exclusion_zones = [tuple(z) for z in data.get('blocker_exclusion_zones', [])]
+        game._build_zone_masks()
         game.win_points = data['win_points']
         game.objectives = data['objectives']
         game.completed_objectives = [set(s) for s in data.get('completed_objectives', [[] for _ in data['players']])]
@@ -1421,8 +1077,15 @@ class PrismWarsGame:
         game.last_heartbeat = data.get('last_heartbeat', {})
         game.pending_disconnects = data.get('pending_disconnects', {})
         game.last_piece_placement = data.get('last_piece_placement')
-        game.portal_pairs = data.get('portal_pairs', {})
+        # JSON turns the player keys into strings and the cells into lists
+        game.portal_pairs = {
+            int(player_idx): {'portal_a': tuple(pair['portal_a']), 'portal_b': tuple(pair['portal_b'])}
+            for player_idx, pair in data.get('portal_pairs', {}).items()
+        }
         game.portal_placement_in_progress = data.get('portal_placement_in_progress')
+        if game.portal_placement_in_progress:
+            first_portal = game.portal_placement_in_progress['first_portal']
+            game.portal_placement_in_progress['first_portal'] = tuple(first_portal)
         
         if data.get('created_at'):
             game.created_at = datetime.fromisoformat(data['created_at'])
@@ -1431,38 +1094,82 @@ class PrismWarsGame:
         
         return game
     
+    def get_state_update(self, state=None):
+        """What changed since the last update, numbered so clients can tell when they missed one.
+        
+        state is a get_state() result built beforehand, e.g. outside a lock;
+        one older than the last update yields an empty update.
+        """
+        update = self.state_sync.unchanged(self.state_version)
+        if update is None:
+            return self.state_sync.update(state if state is not None else self.get_state())
+        update['time_remaining'] = self.get_time_remaining()
+        return update
+    
+    def get_full_state(self, encoding='json'):
+        """The full state as of the last update, with its sequence number, for joining or resyncing"""
+        state = self.state_sync.full(encoding)
+        if state is None:
+            self.get_state_update()
+            state = self.state_sync.full(encoding)
+        # Shallow copy: the built state is shared until the next change
+        state = dict(state)
+        state['time_remaining'] = self.get_time_remaining()
+        return state
+    
+    def get_manifest(self):
+        """The parts of the state fixed once the board is set up, sent to each client once instead of every update"""
+        return {
+            'light_sources': self.light_sources,
+            'amplifier_tiles': self.amplifier_tiles,
+            'protected_zones': self.protected_zones,
+            'blocker_exclusion_zones': self.blocker_exclusion_zones,
+            'objectives': self.objectives,
+            'piece_costs': self.piece_costs,
+            'pickup_cost': self.pickup_cost,
+            'energy_per_turn': self.energy_per_turn,
+            'win_points': self.win_points,
+            'max_rounds': self.max_rounds
+        }
+    
+    def get_manifest_id(self, manifest=None):
+        """Content hash of the manifest, which the state refers to and HTTP serves as its ETag"""
+        if manifest is None:
+            manifest = self.get_manifest()
+        encoded = json.dumps(manifest, sort_keys=True).encode()
+        return hashlib.sha1(encoded).hexdigest()[:16]
+    
     def get_state(self):
-        """Get the full game state for clients"""
+        """Get the per-turn game state for clients; static fields are in get_manifest()"""
         territory = self.calculate_light_paths()
+        legal = self.legal_moves()
         
         return {
             'game_id': self.game_id,
+            'state_version': self.state_version,
+            'manifest_id': self.get_manifest_id(),
             'players': self.players,
             'state': self.state,
-            'board': self.board,
+            'board': self.board.to_rows(self.players),
             'board_size': self.board_size,
             'last_piece_placement': self.last_piece_placement,
             'portal_pairs': self.portal_pairs,
             'portal_placement_in_progress': self.portal_placement_in_progress,
-            'light_sources': self.light_sources,
             'current_player': self.current_player,
             'round_number': self.round_number,
-            'max_rounds': self.max_rounds,
             'winner': self.winner,
             'player_inventory': self.player_inventory,
             'player_energy': self.player_energy,
-            'energy_per_turn': self.energy_per_turn,
-            'piece_costs': self.piece_costs,
-            'pickup_cost': self.pickup_cost,
-            'territory': [[list(cell) for cell in row] for row in territory],
+            'territory': [[sorted(cell) for cell in row] for row in territory],
             'scores': self.get_scores(),
-            'amplifier_tiles': self.amplifier_tiles,
-            'protected_zones': self.protected_zones,
-            'blocker_exclusion_zones': self.blocker_exclusion_zones,
-            'win_points': self.win_points,
-            'objectives': self.objectives,
             'light_beam_segments': self.get_light_beam_segments(),
             'time_remaining': self.get_time_remaining(),
             'disconnected_players': list(self.disconnected_players),
-            'missed_turns': self.missed_turns
+            'missed_turns': self.missed_turns,
+            # The mover's legal targets as hex bitmasks (bit y * board_size + x)
+            'legal_moves': {
+                'player': self.current_player,
+                'place': {piece_type: format(mask, 'x') for piece_type, mask in legal['place'].items()},
+                'pickup': format(legal['pickup'], 'x')
+            }
         }
@@ -0,0 +1,124 @@
+"""Board layouts for any board size and player count.
+
+The classic 16x16 layouts for 2-4 players are kept exactly as they were;
+every other combination is generated by spreading the players evenly around
+the board edge, each with two light sources either side of its anchor
+point, so a 2 or 4 player game on a larger board looks like a scaled-up
+classic one.
+
+Piece codes keep the owner in three bits, so a game has at most 8 players.
+Board sizes are even: the center objective is the 2x2 block in the middle
+and mirrored layouts need the board to split into equal halves.
+"""
+MIN_BOARD_SIZE = 8
+MAX_BOARD_SIZE = 64
+CLASSIC_BOARD_SIZE = 16
+MAX_PLAYERS = 8
+
+PLAYER_COLORS = ['#FF6B6B', '#4ECDC4', '#FFD93D', '#A855F7', '#F97316', '#22C55E', '#3B82F6', '#EC4899']
+
+# (x, y, direction) of the first lit cell of each source, per player
+CLASSIC_SOURCES = {
+    2: [
+        [(3, 0, 'down'), (0, 3, 'right')],
+        [(12, 15, 'up'), (15, 12, 'left')]
+    ],
+    3: [
+        [(3, 0, 'down'), (0, 4, 'right')],
+        [(15, 6, 'left'), (11, 15, 'up')],
+        [(0, 11, 'right'), (4, 15, 'up')]
+    ],
+    4: [
+        [(3, 0, 'down'), (0, 3, 'right')],
+        [(12, 0, 'down'), (15, 3, 'left')],
+        [(3, 15, 'up'), (0, 12, 'right')],
+        [(12, 15, 'up'), (15, 12, 'left')]
+    ]
+}
+
+
+def valid_board_size(size):
+    """Whether a game can be played on a size x size board"""
+    return MIN_BOARD_SIZE <= size <= MAX_BOARD_SIZE and size % 2 == 0
+
+
+def _edge_cell(size, t):
+    """Cell t steps clockwise around the edge from the top-left corner, and the inward direction"""
+    last = size - 1
+    side, k = divmod(t % (4 * last), last)
+    if side == 0:
+        return k, 0, 'down'
+    if side == 1:
+        return last, k, 'left'
+    if side == 2:
+        return last - k, last, 'up'
+    return 0, last - k, 'right'
+
+
+def source_entry_cells(size, num_players):
+    """(x, y, direction) of the first lit cell of each player's light sources"""
+    if size == CLASSIC_BOARD_SIZE and num_players in CLASSIC_SOURCES:
+        return CLASSIC_SOURCES[num_players]
+
+    perimeter = 4 * (size - 1)
+    spacing = perimeter / num_players
+    # Sources sit 3/16 of the way along an edge from the anchor, as in the classic layouts,
+    # but close enough to the anchor not to run into the neighbouring players
+    offset = max(1, min(round(size * 3 / 16), int(spacing / 3)))
+
+    positions = []
+    for player in range(num_players):
+        anchor = round(player * spacing)
+        positions.append([_edge_cell(size, anchor + offset), _edge_cell(size, anchor - offset)])
+    return positions
+
+
+def light_sources(size, players):
+    """Light source dicts for a board, two per player, just outside the edge"""
+    sources = []
+    for player, entries in enumerate(source_entry_cells(size, len(players))):
+        for x, y, direction in entries:
+            sources.append({
+                'x': x if direction in ['up', 'down'] else (-1 if direction == 'right' else size),
+                'y': y if direction in ['left', 'right'] else (-1 if direction == 'down' else size),
+                'direction': direction,
+                'player': player,
+                'color': players[player]['color']
+            })
+    return sources
+
+
+def amplifier_count(size):
+    """5 on the classic board, growing with the board area"""
+    return max(5, round(5 * size * size / CLASSIC_BOARD_SIZE ** 2))
+
+
+def amplifier_margin(size):
+    """Amplifier tiles stay this many cells away from the edge"""
+    return size // 4
+
+
+def objective_targets(size):
+    """Thresholds of the count-based objectives, scaled from the classic 16x16 values"""
+    edge_cells = 4 * (size - 1)
+    quadrant_cells = (size // 2) ** 2
+    return {
+        'border_dominance': max(1, round(15 * edge_cells / 60)),
+        'amplifier_control': max(1, round(3 * amplifier_count(size) / 5)),
+        'expansionist': max(1, round(5 * quadrant_cells / 64))
+    }
+
+
+def objective_definitions(size):
+    """The objectives players are dealt from, with descriptions matching the board size"""
+    targets = objective_targets(size)
+    return [
+        {'id': 'corners', 'name': 'Control All 4 Corners', 'points': 15, 'description': 'Control all 4 corner cells'},
+        {'id': 'center', 'name': 'Dominate Center', 'points': 12, 'description': 'Control the center 2x2 area'},
+        {'id': 'border_dominance', 'name': 'Border Dominance', 'points': 12,
+         'description': f"Control {targets['border_dominance']}+ edge cells"},
+        {'id': 'amplifier_control', 'name': 'Power Surge', 'points': 12,
+         'description': f"Control {targets['amplifier_control']}+ amplifier tiles"},
+        {'id': 'expansionist', 'name': 'Expansionist', 'points': 12,
+         'description': f"Control {targets['expansionist']}+ cells in each quadrant"},
+    ]
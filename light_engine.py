@@ -0,0 +1,584 @@
+import threading
+from array import array
+from heapq import heappop, heappush
+
+import transpositions
+
+# Directions are small integers in clockwise order; the names are only used
+# for light sources and anything sent to clients.
+UP, RIGHT, DOWN, LEFT = range(4)
+DIRECTIONS = ('up', 'right', 'down', 'left')
+DIRECTION_IDS = {name: i for i, name in enumerate(DIRECTIONS)}
+DX = (0, 1, 0, -1)
+DY = (-1, 0, 1, 0)
+
+EMPTY, MIRROR, PRISM, SPLITTER, BLOCKER, PORTAL = range(6)
+PIECE_KINDS = {
+    'mirror': MIRROR,
+    'prism': PRISM,
+    'splitter': SPLITTER,
+    'blocker': BLOCKER,
+    'portal': PORTAL
+}
+PIECE_TYPES = (None, 'mirror', 'prism', 'splitter', 'blocker', 'portal')
+
+
+def _outgoing(kind, quarter_turns, direction):
+    """Directions leaving a piece for a beam arriving in a given direction"""
+    left = (direction - 1) % 4
+    right = (direction + 1) % 4
+
+    if kind in (EMPTY, PORTAL):
+        # Portals teleport, but light leaves in the direction it entered
+        return (direction,)
+    if kind == MIRROR:
+        if quarter_turns % 2 == 0:
+            reflections = {UP: LEFT, DOWN: RIGHT, LEFT: UP, RIGHT: DOWN}
+        else:
+            reflections = {UP: RIGHT, DOWN: LEFT, LEFT: DOWN, RIGHT: UP}
+        return (reflections[direction],)
+    if kind == PRISM:
+        return (direction, left, right)
+    if kind == SPLITTER:
+        return (left, right)
+    return ()
+
+
+# TRANSITIONS[kind][rotation // 90 % 4][incoming] -> outgoing directions; the
+# first entry continues the current beam, the rest start branches
+TRANSITIONS = tuple(
+    tuple(
+        tuple(_outgoing(kind, quarter_turns, direction) for direction in range(4))
+        for quarter_turns in range(4)
+    )
+    for kind in range(6)
+)
+
+
+def piece_code(kind, player, quarter_turns):
+    """Pack a piece into one byte: kind in bits 0-2, rotation in 3-4, owner in 5-7"""
+    return kind | (quarter_turns << 3) | (player << 5)
+
+
+# Per-code lookups so the tracer never unpacks bits itself
+CODE_KIND = tuple(code & 7 for code in range(256))
+CODE_OWNER = tuple(code >> 5 for code in range(256))
+CODE_TRANSITIONS = tuple(TRANSITIONS[code & 7 if code & 7 <= PORTAL else BLOCKER][(code >> 3) & 3]
+                         for code in range(256))
+
+
+try:
+    popcount = int.bit_count
+except AttributeError:  # Python < 3.10
+    def popcount(mask):
+        return bin(mask).count('1')
+
+
+def cells_mask(cells, size):
+    """Bitboard with a bit set for every (x, y) in cells"""
+    mask = 0
+    for x, y in cells:
+        mask |= 1 << (y * size + x)
+    return mask
+
+
+def solo_masks(player_masks):
+    """Per-player masks of the cells lit by that player alone"""
+    lit = 0
+    contested = 0
+    for mask in player_masks:
+        contested |= lit & mask
+        lit |= mask
+    return [mask & ~contested for mask in player_masks]
+
+
+_region_masks = {}
+
+
+def region_masks(size):
+    """Objective regions of a board size as bitboards (computed once per size)"""
+    regions = _region_masks.get(size)
+    if regions is None:
+        last = size - 1
+        half = size // 2
+        border = [(x, y) for x in range(size) for y in (0, last)]
+        border += [(x, y) for x in (0, last) for y in range(1, last)]
+        regions = {
+            'corners': cells_mask([(0, 0), (last, 0), (0, last), (last, last)], size),
+            'center': cells_mask([(x, y) for x in (half - 1, half) for y in (half - 1, half)], size),
+            'border': cells_mask(border, size),
+            'quadrants': [
+                cells_mask([(x, y) for x in xs for y in ys], size)
+                for ys in (range(half), range(half, size))
+                for xs in (range(half), range(half, size))
+            ]
+        }
+        _region_masks[size] = regions
+    return regions
+
+
+def code_table(predicate):
+    """bytes.translate table mapping each piece code to b'1' where predicate holds, else b'0'"""
+    return bytes(49 if predicate(code) else 48 for code in range(256))
+
+
+_OCCUPIED = code_table(lambda code: code != EMPTY)
+# Per player: their own pieces apart from portals, which are permanent
+_PICKUP = [code_table(lambda code, player=player: code != EMPTY and CODE_OWNER[code] == player and
+                      CODE_KIND[code] != PORTAL)
+           for player in range(8)]
+
+
+def code_mask(cells, table):
+    """Bitboard of the cells of a packed board whose code maps to b'1' in a code_table()"""
+    return int(cells.translate(table)[::-1], 2)
+
+
+def occupied_mask(cells):
+    return code_mask(cells, _OCCUPIED)
+
+
+def pickup_mask(cells, player):
+    """Cells holding a piece the player may pick up"""
+    return code_mask(cells, _PICKUP[player])
+
+
+def mask_cells(mask, size):
+    """(x, y) of every set bit, in cell id order"""
+    bits = bin(mask)[:1:-1]
+    cells = []
+    cell = bits.find('1')
+    while cell >= 0:
+        cells.append((cell % size, cell // size))
+        cell = bits.find('1', cell + 1)
+    return cells
+
+
+_column_masks = {}
+
+
+def neighbourhood_mask(mask, size):
+    """The cells of mask and their orthogonal neighbours"""
+    columns = _column_masks.get(size)
+    if columns is None:
+        full = (1 << size * size) - 1
+        columns = _column_masks[size] = (
+            full,
+            full ^ cells_mask([(0, y) for y in range(size)], size),
+            full ^ cells_mask([(size - 1, y) for y in range(size)], size)
+        )
+    full, not_left, not_right = columns
+    # Shifting by one cell id moves a bit sideways; the edge columns are masked off first so bits never wrap rows
+    return (mask | mask << size | mask >> size | (mask & not_right) << 1 | (mask & not_left) >> 1) & full
+
+
+def _cell_flags(player_masks, size):
+    """Per cell id, a tuple with a '0' or '1' per player.
+
+    Built from the binary digits of the bitboards, which stays linear on
+    large boards where picking bits off one at a time copies the whole int
+    for every lit cell.
+    """
+    cells = size * size
+    if not player_masks:
+        return [()] * cells
+    return zip(*[bin(mask)[:1:-1].ljust(cells, '0') for mask in player_masks])
+
+
+def territory_grid(player_masks, size):
+    """Expand per-player bitboards into rows of controller sets"""
+    players_of = {}
+    cells = []
+    for flags in _cell_flags(player_masks, size):
+        players = players_of.get(flags)
+        if players is None:
+            players = players_of[flags] = [p for p, flag in enumerate(flags) if flag == '1']
+        cells.append(set(players))
+    return [cells[y * size:(y + 1) * size] for y in range(size)]
+
+
+def controller_masks(player_masks, size):
+    """Per-cell bitmask of the players lighting it (bit p for player p), indexed by cell id"""
+    mask_of = {}
+    cells = []
+    for flags in _cell_flags(player_masks, size):
+        mask = mask_of.get(flags)
+        if mask is None:
+            mask = mask_of[flags] = sum(1 << p for p, flag in enumerate(flags) if flag == '1')
+        cells.append(mask)
+    return cells
+
+
+def controller_grid(masks, size, num_players):
+    """Rows of controller sets from per-cell bitmasks"""
+    return [[{p for p in range(num_players) if masks[y * size + x] >> p & 1} for x in range(size)]
+            for y in range(size)]
+
+
+class Board:
+    """Square board stored as one packed piece code per cell (0 = empty).
+
+    Piece colors and portal pair ids are derived from the owner, so the dict
+    form used for persistence and clients is only built by to_rows().
+    """
+
+    def __init__(self, size, cells=None):
+        self.size = size
+        self.cells = bytearray(size * size) if cells is None else cells
+
+    def copy(self):
+        return Board(self.size, bytearray(self.cells))
+
+    def overlay(self, changes):
+        """Snapshot with hypothetical (x, y, piece_type, player, rotation) changes laid over it.
+
+        A piece_type of None removes the piece. The board itself is never
+        written to, so previews, hints and bots can evaluate hypotheticals
+        concurrently with real moves.
+        """
+        view = self.copy()
+        for x, y, piece_type, player, rotation in changes:
+            if piece_type is None:
+                view.remove(x, y)
+            else:
+                view.place(x, y, piece_type, player, rotation)
+        return view
+
+    def code(self, x, y):
+        return self.cells[y * self.size + x]
+
+    def set_code(self, x, y, code):
+        self.cells[y * self.size + x] = code
+
+    def is_empty(self, x, y):
+        return not self.cells[y * self.size + x]
+
+    def piece_type(self, x, y):
+        return PIECE_TYPES[CODE_KIND[self.cells[y * self.size + x]]]
+
+    def owner(self, x, y):
+        code = self.cells[y * self.size + x]
+        return CODE_OWNER[code] if code else None
+
+    def place(self, x, y, piece_type, player, rotation=0):
+        self.cells[y * self.size + x] = piece_code(PIECE_KINDS[piece_type], player, rotation // 90 % 4)
+
+    def remove(self, x, y):
+        self.cells[y * self.size + x] = EMPTY
+
+    def pieces(self):
+        """Yield (x, y, piece_type, player, rotation) for every occupied cell"""
+        size = self.size
+        for cell, code in enumerate(self.cells):
+            if code:
+                yield (cell % size, cell // size, PIECE_TYPES[CODE_KIND[code]],
+                       CODE_OWNER[code], ((code >> 3) & 3) * 90)
+
+    def to_rows(self, players):
+        """Board as rows of None or piece dicts, as saved and sent to clients"""
+        rows = [[None] * self.size for _ in range(self.size)]
+        for x, y, piece_type, player, rotation in self.pieces():
+            piece = {
+                'type': piece_type,
+                'player': player,
+                'rotation': rotation,
+                'color': players[player]['color']
+            }
+            if piece_type == 'portal':
+                piece['pair_id'] = player
+            rows[y][x] = piece
+        return rows
+
+    @classmethod
+    def from_rows(cls, rows, size):
+        board = cls(size)
+        for y, row in enumerate(rows):
+            for x, piece in enumerate(row):
+                if piece is not None:
+                    kind = PIECE_KINDS.get(piece['type'], BLOCKER)
+                    board.cells[y * size + x] = piece_code(kind, piece['player'],
+                                                           piece.get('rotation', 0) // 90 % 4)
+        return board
+
+
+class LightEngine:
+    """Single-pass beam traversal shared by territory, scoring and animation.
+
+    One walk over every active light source produces everything the game
+    derives from light: the territory grid, the beam segments drawn by the
+    client, the length of each source's beam and the longest run of the
+    owner's mirrors along each source's main beam.
+
+    The engine keeps the traced record of every source (including all of its
+    branches). A trace only depends on the cells it lit, so when mutators
+    report the cells they changed, only the sources whose lit bitboard
+    contains one of them are re-traced. Positions are also looked up in the
+    process-wide transposition cache first, so a position any game has
+    already traced is not traced again.
+
+    Territory is kept as one bitboard per player (bit y * board_size + x),
+    the OR of the lit cells of that player's sources. The rows-of-sets form
+    is only expanded for clients.
+    """
+
+    def __init__(self, game):
+        self.game = game
+        self._records = None      # per light source, parallel to game.light_sources
+        self._result = None
+        self._key = None          # transposition key of the position _result traced
+        self._dirty_cells = set()
+        self._dirty_sources = set()
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """Drop all cached traces, e.g. after the light sources were laid out again"""
+        with self._lock:
+            self._records = None
+            self._result = None
+            self._key = None
+            self._dirty_cells = set()
+            self._dirty_sources = set()
+
+    def invalidate_cells(self, cells):
+        """Mark board cells whose contents changed since the last trace"""
+        with self._lock:
+            self._dirty_cells.update(cells)
+
+    def invalidate_player(self, player_idx):
+        """Mark every source of a player for re-tracing (connection changes)"""
+        with self._lock:
+            for i, source in enumerate(self.game.light_sources):
+                if source['player'] == player_idx:
+                    self._dirty_sources.add(i)
+
+    def current(self):
+        """Return the trace for the current board, re-tracing only beams that crossed a changed cell"""
+        return self.current_with_key()[1]
+
+    def current_with_key(self):
+        """The current trace and its transposition key (None if it must not be cached)"""
+        with self._lock:
+            if self._records is None or self._dirty_cells or self._dirty_sources:
+                key = transpositions.position_key(self.game)
+                cached = transpositions.shared.get(key)
+                if cached is not None:
+                    records, self._result = cached
+                    self._records = list(records)
+                    self._dirty_cells = set()
+                    self._dirty_sources = set()
+                else:
+                    if self._records is None:
+                        self._rebuild()
+                    else:
+                        self._update()
+                    # A mutator changes the board before it invalidates, so the board may have
+                    # moved on during the trace; only a position that held throughout is shared
+                    if transpositions.position_key(self.game) == key:
+                        transpositions.shared.put(key, (tuple(self._records), self._result))
+                    else:
+                        key = None
+                self._key = key
+            return self._key, self._result
+
+    def current_territory(self):
+        """Rows of controller sets for the current trace (memoized, do not mutate)"""
+        result = self.current()
+        if 'territory' not in result:
+            result['territory'] = territory_grid(result['player_masks'], self.game.board_size)
+        return result['territory']
+
+    def trace(self, board=None):
+        """Trace all active light sources from scratch without touching the cached state.
+
+        board defaults to the game's board; pass an overlay() of it to trace a
+        hypothetical position.
+        """
+        cells = (board or self.game.board).cells
+        records = [self._trace_source(source, cells) for source in self.game.light_sources]
+        result = self._assemble(records)
+        result['territory'] = territory_grid(result['player_masks'], self.game.board_size)
+        return result
+
+    def _assemble(self, records):
+        player_masks = [0] * len(self.game.players)
+        segments = []
+        for record, source in zip(records, self.game.light_sources):
+            player_masks[source['player']] |= record['lit']
+            segments.extend(record['segments'])
+
+        return {
+            'player_masks': player_masks,
+            'segments': segments,
+            'beam_lengths': [record['length'] for record in records],
+            'mirror_chains': [record['chain'] for record in records]
+        }
+
+    def _rebuild(self):
+        self._records = [self._trace_source(source) for source in self.game.light_sources]
+        self._dirty_cells = set()
+        self._dirty_sources = set()
+        self._result = self._assemble(self._records)
+
+    def _update(self):
+        dirty_cells, self._dirty_cells = self._dirty_cells, set()
+        affected, self._dirty_sources = self._dirty_sources, set()
+        dirty = cells_mask(dirty_cells, self.game.board_size)
+        if dirty:
+            affected.update(i for i, record in enumerate(self._records) if record['lit'] & dirty)
+
+        light_sources = self.game.light_sources
+        for i in sorted(affected):
+            self._records[i] = self._trace_source(light_sources[i])
+
+        self._result = self._assemble(self._records)
+
+    @staticmethod
+    def _empty_record():
+        return {'lit': 0, 'segments': [], 'length': 0, 'chain': 0}
+
+    def _trace_source(self, source, cells=None):
+        """Trace one light source and all its branches into a standalone record.
+
+        'length' is the depth in cells of the deepest (cell, direction) state
+        the beam reaches; cells is the packed board, the game's by default.
+        """
+        if source['player'] in self.game.disconnected_players:
+            return self._empty_record()
+
+        game = self.game
+        if cells is None:
+            cells = game.board.cells
+        portal_pairs = game.portal_pairs
+        size = game.board_size
+        player = source['player']
+        color = source['color']
+
+        depths = array('I', [0]) * (size * size * 4)  # by cell id * 4 + incoming direction, 0 if unreached
+        lit = bytearray(b'0') * (size * size)  # '1' per lit cell, read back as a binary number
+        segments = []
+        follow_chain = True
+        chain_current = 0
+        chain_best = 0
+        longest = 0
+        shortened = False
+
+        # Beams still to walk, shallowest first so that few paths need shortening: (depth of
+        # the cell they leave from, tie-break, x, y there, direction, segment start). The
+        # segment start is False for a beam only walked again to shorten paths already drawn.
+        pending = [(0, 0, source['x'], source['y'], DIRECTION_IDS[source['direction']], None)]
+        pushed = 1
+
+        while pending:
+            depth, _, x, y, direction, segment_start = heappop(pending)
+            dx = DX[direction]
+            dy = DY[direction]
+            x += dx
+            y += dy
+            depth += 1
+
+            while True:
+                if x < 0 or x >= size or y < 0 or y >= size:
+                    if segment_start:
+                        segments.append(self._segment(segment_start, x - dx, y - dy, color, player))
+                    break
+
+                cell = y * size + x
+                state = cell * 4 + direction
+                reached = depths[state]
+                if reached:
+                    # Everything from here on has already been traced and drawn; walk
+                    # on only while this path is the shorter one, to lower the depths
+                    if segment_start:
+                        segments.append(self._segment(segment_start, x, y, color, player))
+                    segment_start = False
+                    if reached <= depth:
+                        break
+                    shortened = True
+                depths[state] = depth
+                if depth > longest:
+                    longest = depth
+                lit[cell] = 49  # ord('1')
+                if segment_start is None:
+                    segment_start = (x, y)
+
+                code = cells[cell]
+
+                if not code:
+                    x += dx
+                    y += dy
+                    depth += 1
+                    continue
+
+                if segment_start:
+                    segments.append(self._segment(segment_start, x, y, color, player))
+
+                kind = CODE_KIND[code]
+
+                if follow_chain:
+                    if kind == MIRROR:
+                        if CODE_OWNER[code] == player:
+                            chain_current += 1
+                        else:
+                            chain_best = max(chain_best, chain_current)
+                            chain_current = 0
+                    else:
+                        follow_chain = False
+
+                outgoing = CODE_TRANSITIONS[code][direction]
+                if not outgoing:
+                    break
+
+                if kind == PORTAL:
+                    # Check if this portal has a pair
+                    portal_owner = CODE_OWNER[code]
+                    if portal_owner not in portal_pairs:
+                        break
+
+                    pair_data = portal_pairs[portal_owner]
+                    if (x, y) == pair_data['portal_a']:
+                        exit_portal = pair_data['portal_b']
+                    elif (x, y) == pair_data['portal_b']:
+                        exit_portal = pair_data['portal_a']
+                    else:
+                        # Incomplete pair, portal doesn't work
+                        break
+
+                    x, y = exit_portal[0], exit_portal[1]
+                else:
+                    for new_dir in outgoing[1:]:
+                        heappush(pending, (depth, pushed, x, y, new_dir, None if segment_start else False))
+                        pushed += 1
+
+                direction = outgoing[0]
+                dx = DX[direction]
+                dy = DY[direction]
+                if segment_start:
+                    segment_start = (x, y)
+                x += dx
+                y += dy
+                depth += 1
+
+            # Only the main beam, the first one walked, carries the mirror chain
+            follow_chain = False
+
+        if shortened:
+            # A shorter path may have lowered the deepest state found so far
+            longest = max(depths)
+        return {
+            # Cell 0 is the lowest bit, so the digits are read back to front
+            'lit': int(lit[::-1], 2),
+            'segments': segments,
+            'length': longest,
+            'chain': max(chain_best, chain_current)
+        }
+
+    @staticmethod
+    def _segment(start, x2, y2, color, player):
+        return {
+            'x1': start[0],
+            'y1': start[1],
+            'x2': x2,
+            'y2': y2,
+            'color': color,
+            'player': player
+        }
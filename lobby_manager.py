@@ -2,6 +2,8 @@ import secrets
 import string
 from datetime import datetime
 from game_logic import PrismWarsGame
+import bots
+import layouts
 
 class LobbyManager:
     def __init__(self):
@@ -14,10 +16,10 @@ class LobbyManager:
             if game_id not in self.games:
                 return game_id
     
-    def create_game(self, max_players=2):
+    def create_game(self, max_players=2, board_size=layouts.CLASSIC_BOARD_SIZE):
         """Create a new game lobby"""
         game_id = self.generate_game_id()
-        game = PrismWarsGame(game_id, max_players)
+        game = PrismWarsGame(game_id, max_players, board_size)
         game.created_at = datetime.now()
         self.games[game_id] = game
         return game_id
@@ -41,8 +43,7 @@ class LobbyManager:
                 return True
         
         # Assign color based on player index
-        colors = ['#FF6B6B', '#4ECDC4', '#FFD93D', '#A855F7']
-        color = colors[len(game.players)]
+        color = layouts.PLAYER_COLORS[len(game.players)]
         
         player = {
             'id': player_id,
@@ -52,6 +53,34 @@ class LobbyManager:
         }
         
         game.players.append(player)
+        game._bump_version()
+        return True
+    
+    def add_bot_to_game(self, game_id, difficulty):
+        """Fill the next seat of a game lobby with a bot, which is always ready"""
+        if game_id not in self.games or difficulty not in bots.DIFFICULTIES:
+            return False
+        
+        game = self.games[game_id]
+        
+        if game.state != 'waiting':
+            return False
+        
+        if len(game.players) >= game.max_players:
+            return False
+        
+        bot_number = sum(1 for p in game.players if p.get('bot')) + 1
+        
+        player = {
+            'id': 'bot-' + secrets.token_hex(8),
+            'username': f'Bot {bot_number} ({difficulty})',
+            'color': layouts.PLAYER_COLORS[len(game.players)],
+            'ready': True,
+            'bot': difficulty
+        }
+        
+        game.players.append(player)
+        game._bump_version()
         return True
     
     def set_player_ready(self, game_id, player_id):
@@ -64,6 +93,7 @@ class LobbyManager:
         for player in game.players:
             if player['id'] == player_id:
                 player['ready'] = True
+                game._bump_version()
                 return True
         
         return False
@@ -87,6 +117,7 @@ class LobbyManager:
         game.initialize_board()
         game.state = 'playing'
         game.started_at = datetime.now()
+        game._bump_version()
         return True
     
     def get_game(self, game_id):
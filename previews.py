@@ -0,0 +1,296 @@
+"""Hover previews for the player whose turn it is.
+
+Single previews are kept in a per-game PreviewCache, which prewarm() fills
+in the background when a turn starts. A preview bundle holds the territory
+that every legal placement of the mover would produce, computed in one batch
+so that the client can resolve hover previews locally instead of asking the
+server on every mouse move.
+
+Bundle layout (plain JSON types):
+
+    {
+        'version': state version the previews were computed for,
+        'player': player index,
+        'rotations': {piece_type: [preview index for 0, 90, 180 and 270 degrees]},
+        'previews': {piece_type: [{cell id: [cell id, controller bitmask, ...]}]}
+    }
+
+Rotations that route light the same way share one preview. Each preview
+maps the cell id (y * board_size + x) of a legal placement to the cells whose
+controllers change, as a flat list of (cell id, bitmask) pairs where bit p
+is set when player p lights the cell. Cells that are missing are not legal
+for that piece.
+"""
+import threading
+import time
+from functools import lru_cache
+
+import batch_engine
+import transpositions
+from light_engine import PIECE_KINDS, TRANSITIONS, controller_masks, mask_cells, neighbourhood_mask
+
+np = batch_engine.np
+
+# A bundle grows with the board area times the number of legal cells, so
+# larger boards stick to single previews (about 0.1 MB at 16x16, 20 MB at 64x64)
+MAX_BUNDLE_BOARD_SIZE = 24
+
+# Previews prewarm() computes per turn; other hovers are traced when asked for
+PREWARM_CANDIDATES = 96
+
+
+class PreviewCache(transpositions.LRUCache):
+    """Bounded LRU of previews keyed by (state version, x, y, piece_type, rotation).
+
+    The rotation is the canonical_rotation() of its class, so rotations that
+    route light the same way share one entry. Values are per-cell controller
+    bitmasks (see controller_masks), which are far smaller than rows of sets.
+    Keys carry the state version, so entries of an older state can never be
+    returned; clear() on every mutation just frees them early.
+    """
+
+
+class TokenBucket:
+    """Allows rate requests per second on average and bursts of up to burst"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def wait(self):
+        """Seconds until take() can succeed"""
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class PreviewThrottle:
+    """Latest-wins coalescing and per-client rate limiting of preview requests.
+
+    Each client has at most one preview being computed and one pending. A
+    newer request replaces the pending one, so a fast mouse sweep only costs
+    the preview under the cursor when the server catches up. Serving takes a
+    token from the client's bucket; with none left the pending request waits
+    for the next one rather than being dropped, so the cursor's final
+    position is always previewed.
+    """
+
+    def __init__(self, rate=15.0, burst=5):
+        self.rate = rate
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._pending = {}
+        self._busy = set()
+        self.served = 0
+        self.superseded = 0
+        self.rate_limited = 0  # times a pending request waited for a token
+
+    def submit(self, client, request):
+        """Queue a client's request; True means the caller should drain it with next()"""
+        with self._lock:
+            if client in self._pending:
+                self.superseded += 1
+            self._pending[client] = request
+
+            if client in self._busy:
+                return False
+            self._busy.add(client)
+            return True
+
+    def next(self, client):
+        """(request, 0) for the client's newest pending request, (None, 0) once drained.
+
+        (None, seconds) means a request is pending but the client's bucket is
+        empty: call again after that long, by when a newer request may have
+        replaced it.
+        """
+        with self._lock:
+            if client not in self._pending:
+                self._busy.discard(client)
+                return None, 0
+
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                bucket = self._buckets[client] = TokenBucket(self.rate, self.burst)
+            if not bucket.take():
+                self.rate_limited += 1
+                return None, bucket.wait()
+            return self._pending.pop(client), 0
+
+    def record_served(self):
+        with self._lock:
+            self.served += 1
+
+    def forget(self, client):
+        """Drop a disconnected client's bucket and pending request"""
+        with self._lock:
+            self._buckets.pop(client, None)
+            self._pending.pop(client, None)
+            self._busy.discard(client)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'served': self.served,
+                'superseded': self.superseded,
+                'rate_limited': self.rate_limited,
+                'rate': self.rate,
+                'burst': self.burst
+            }
+
+
+@lru_cache(maxsize=None)
+def rotation_classes(piece_type):
+    """Quarter turns that route light differently, and which of them each quarter turn uses"""
+    transitions = TRANSITIONS[PIECE_KINDS[piece_type]]
+    distinct = []
+    index = []
+    for quarter_turns in range(4):
+        for i, other in enumerate(distinct):
+            if transitions[other] == transitions[quarter_turns]:
+                index.append(i)
+                break
+        else:
+            index.append(len(distinct))
+            distinct.append(quarter_turns)
+    return distinct, index
+
+
+def canonical_rotation(piece_type, rotation):
+    """The first rotation of rotation's class, which stands in for the whole class"""
+    distinct, index = rotation_classes(piece_type)
+    return distinct[index[rotation % 360 // 90]] * 90
+
+
+def build_preview_bundle(game, player_idx):
+    """Preview every legal placement of player_idx on the current board"""
+    size = game.board_size
+    candidates = []
+    slots = []  # (piece_type, preview index, cell id) per candidate
+    bundle = {'version': game.state_version, 'player': player_idx, 'rotations': {}, 'previews': {}}
+    legal = game.legal_moves(player_idx)['place']
+
+    for piece_type in PIECE_KINDS:
+        cells = mask_cells(legal[piece_type], size)
+        if not cells:
+            continue
+
+        distinct, index = rotation_classes(piece_type)
+        bundle['rotations'][piece_type] = index
+        bundle['previews'][piece_type] = [{} for _ in distinct]
+        for i, quarter_turns in enumerate(distinct):
+            for x, y in cells:
+                candidates.append((x, y, piece_type, quarter_turns * 90))
+                slots.append((piece_type, i, y * size + x))
+
+    if not candidates:
+        return bundle
+
+    base = controller_masks(game.engine.current()['player_masks'], size)
+    territory = game.evaluate_placements(candidates, player_idx)['territory']
+    for (piece_type, i, cell), delta in zip(slots, _territory_deltas(territory, base, size)):
+        bundle['previews'][piece_type][i][cell] = delta
+
+    return bundle
+
+
+def _territory_deltas(territory, base, size):
+    """Flat [cell id, bitmask, ...] changes against base for each candidate's territory"""
+    if np is not None and isinstance(territory, np.ndarray):
+        grids = territory.reshape(len(territory), -1)
+        changed = grids != np.array(base, dtype=grids.dtype)
+        rows, cells = np.nonzero(changed)
+        pairs = np.column_stack((cells, grids[rows, cells]))
+        bounds = np.cumsum(changed.sum(axis=1))[:-1]
+        return [part.ravel().tolist() for part in np.split(pairs, bounds)]
+
+    return [territory_delta(base, [mask for row in grid for mask in row]) for grid in territory]
+
+
+def territory_delta(base, masks):
+    """Flat [cell id, bitmask, ...] list of the cells whose controllers differ from base"""
+    delta = []
+    for cell, (old_mask, new_mask) in enumerate(zip(base, masks)):
+        if new_mask != old_mask:
+            delta.extend((cell, new_mask))
+    return delta
+
+
+def beam_neighbourhood_mask(game):
+    """Bitboard of the cells on or next to a beam, most likely to be hovered next"""
+    lit = 0
+    for mask in game.engine.current()['player_masks']:
+        lit |= mask
+    return neighbourhood_mask(lit, game.board_size)
+
+
+def beam_neighbourhood(game):
+    """Cells on or next to a beam"""
+    return mask_cells(beam_neighbourhood_mask(game), game.board_size)
+
+
+def prewarm(game):
+    """Cache previews of the mover's likeliest hovers, a few of each piece type.
+
+    Takes the nearest legal cells of each piece type in turn (the mover's
+    own beams, then other beams, then cells next to a beam), one rotation
+    class at a time, up to PREWARM_CANDIDATES. Runs in the background on
+    every new turn state, so it is only done when NumPy can batch the
+    traces. Results are dropped if the game moves on while it runs.
+    """
+    if np is None or game.state != 'playing':
+        return
+
+    version = game.state_version
+    player_idx = game.current_player
+    size = game.board_size
+    player_masks = game.engine.current()['player_masks']
+    own = player_masks[player_idx]
+    lit = 0
+    for mask in player_masks:
+        lit |= mask
+    rings = (own, lit & ~own, neighbourhood_mask(lit, size) & ~lit)
+    legal = game.legal_moves(player_idx)['place']
+
+    queues = [_nearest_placements(game, version, piece_type, legal[piece_type], rings)
+              for piece_type in PIECE_KINDS]
+    # Never warm more than fits, or the warm-up would evict itself
+    room = min(PREWARM_CANDIDATES, game.preview_cache.max_entries)
+    candidates = []
+    while queues and len(candidates) < room:
+        for queue in list(queues):
+            candidate = next(queue, None)
+            if candidate is None:
+                queues.remove(queue)
+            elif len(candidates) < room:
+                candidates.append(candidate)
+
+    if not candidates:
+        return
+
+    territory = game.evaluate_placements(candidates, player_idx)['territory']
+    if game.state_version != version:
+        return
+
+    for (x, y, piece_type, rotation), masks in zip(candidates, territory.reshape(len(candidates), -1).tolist()):
+        game.preview_cache.put((version, x, y, piece_type, rotation), masks)
+
+
+def _nearest_placements(game, version, piece_type, legal, rings):
+    """Uncached placements of piece_type on the legal cells of each ring in turn, one per rotation class"""
+    distinct, _ = rotation_classes(piece_type)
+    for ring in rings:
+        for x, y in mask_cells(legal & ring, game.board_size):
+            for quarter_turns in distinct:
+                if (version, x, y, piece_type, quarter_turns * 90) not in game.preview_cache:
+                    yield x, y, piece_type, quarter_turns * 90
@@ -0,0 +1,172 @@
+"""Play complete games headlessly between move policies, for balance sweeps and load tests.
+
+Usage:
+    python simulate.py [--games 100] [--policies greedy,random] [--board-size 16]
+                       [--workers 4] [--seed 0] [--rotate]
+
+Each game is seeded from --seed and its number, which fixes the amplifier
+tiles, objectives and the random policy's moves, so a run can be repeated
+exactly (the bot policies search within a CPU budget and so may not).
+--policies gives one policy per seat and also sets the player count:
+random plays a uniformly random legal move, greedy the placement that gains
+the most points right now (or passes), and easy, medium and hard are the bot
+seats. --rotate shifts the seating every game so no policy keeps the first
+move. Games are spread over --workers processes; the totals report games and
+moves per second, each policy's score distribution and each seat's wins.
+"""
+import argparse
+import random
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import bots
+from game_logic import PrismWarsGame
+from layouts import CLASSIC_BOARD_SIZE, MAX_BOARD_SIZE, MIN_BOARD_SIZE, PLAYER_COLORS, valid_board_size
+from light_engine import PIECE_KINDS, mask_cells
+
+
+def random_policy(game, player_idx, rng):
+    """Any legal placement, pickup or pass, uniformly"""
+    legal = game.legal_moves(player_idx)
+    moves = [('pass',)]
+    for piece_type in PIECE_KINDS:
+        if piece_type == 'portal':
+            continue
+        for x, y in mask_cells(legal['place'][piece_type], game.board_size):
+            moves.append(('place', x, y, piece_type, rng.choice([0, 90, 180, 270])))
+    moves.extend(('pickup', x, y) for x, y in mask_cells(legal['pickup'], game.board_size))
+    return rng.choice(moves)
+
+
+def greedy_policy(game, player_idx, rng):
+    """The placement with the largest immediate score gain, or a pass when none gains"""
+    hints = bots.rank_hints(game, player_idx, count=1, budget=float('inf'))['hints']
+    if not hints or hints[0]['delta'] <= 0:
+        return ('pass',)
+    best = hints[0]
+    return ('place', best['x'], best['y'], best['piece_type'], best['rotation'])
+
+
+def bot_policy(difficulty):
+    def policy(game, player_idx, rng):
+        return bots.choose_move(game, player_idx, difficulty, rng)[0]
+    return policy
+
+
+POLICIES = {'random': random_policy, 'greedy': greedy_policy}
+POLICIES.update((difficulty, bot_policy(difficulty)) for difficulty in bots.DIFFICULTIES)
+
+
+def play_game(seed, policies, board_size=CLASSIC_BOARD_SIZE):
+    """Play one game to the end with one policy name per seat; returns its result"""
+    rng = random.Random(seed)
+    game = PrismWarsGame(f'SIM{seed}', len(policies), board_size)
+    game.rng = rng
+    game.players = [
+        {'id': str(i), 'username': f'Seat {i + 1}', 'color': PLAYER_COLORS[i], 'ready': True}
+        for i in range(len(policies))
+    ]
+    game.initialize_board()
+    game.state = 'playing'
+
+    start = time.perf_counter()
+    moves = 0
+    while game.state == 'playing':
+        player_idx = game.current_player
+        move = POLICIES[policies[player_idx]](game, player_idx, rng)
+        # Like a bot seat on the server, a rejected move passes the turn
+        if not game.make_move(move)[0]:
+            game.make_move(('pass',))
+        moves += 1
+    # Nothing is ever taken back
+    game._undo_log.clear()
+
+    scores = [score['total'] for score in game.calculate_detailed_scores()]
+    winner = next((i for i, player in enumerate(game.players) if player['username'] == game.winner['username']), None)
+    return {
+        'seed': seed,
+        'policies': list(policies),
+        'scores': scores,
+        'winner': winner,
+        'moves': moves,
+        'rounds': min(game.round_number, game.max_rounds),
+        'seconds': time.perf_counter() - start
+    }
+
+
+def seating(policies, game_number, rotate):
+    if not rotate:
+        return policies
+    shift = game_number % len(policies)
+    return policies[shift:] + policies[:shift]
+
+
+def simulate(games, policies, board_size=CLASSIC_BOARD_SIZE, workers=4, seed=0, rotate=False):
+    """Play games across a process pool; returns the per-game results in game order"""
+    seeds = [seed * 1000003 + number for number in range(games)]
+    seats = [seating(policies, number, rotate) for number in range(games)]
+    sizes = [board_size] * games
+    if workers <= 1:
+        return list(map(play_game, seeds, seats, sizes))
+    with ProcessPoolExecutor(workers) as executor:
+        return list(executor.map(play_game, seeds, seats, sizes, chunksize=max(1, games // (workers * 4))))
+
+
+def summarize(results, elapsed):
+    """Print throughput, score distributions per policy and wins per seat"""
+    moves = sum(result['moves'] for result in results)
+    print(f'Games:           {len(results)} in {elapsed:.1f} s ({len(results) / elapsed:.2f} games/s)')
+    print(f'Moves:           {moves} ({moves / elapsed:.1f} moves/s, {moves / len(results):.1f} per game)')
+    print(f'Rounds:          {statistics.mean(result["rounds"] for result in results):.1f} per game')
+
+    by_policy = {}
+    wins = {}
+    for result in results:
+        for player_idx, (policy, score) in enumerate(zip(result['policies'], result['scores'])):
+            by_policy.setdefault(policy, []).append(score)
+            if result['winner'] == player_idx:
+                wins[policy] = wins.get(policy, 0) + 1
+
+    print()
+    print('policy    games   mean  stdev    min  median    max   wins')
+    for policy, scores in by_policy.items():
+        stdev = statistics.stdev(scores) if len(scores) > 1 else 0.0
+        print(f'{policy:<8}{len(scores):>7}{statistics.mean(scores):7.1f}{stdev:7.1f}{min(scores):7}'
+              f'{statistics.median(scores):8.1f}{max(scores):7}{wins.get(policy, 0):7}')
+
+    seats = len(results[0]['scores'])
+    seat_wins = [sum(1 for result in results if result['winner'] == seat) for seat in range(seats)]
+    ties = sum(1 for result in results if result['winner'] is None)
+    print()
+    print('Wins by seat:    ' + '  '.join(f'{seat + 1}: {count}' for seat, count in enumerate(seat_wins)) +
+          f'  ties: {ties}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Play Prism Wars games headlessly between move policies')
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--policies', default='greedy,random',
+                        help='one per seat, from ' + ', '.join(POLICIES))
+    parser.add_argument('--board-size', type=int, default=CLASSIC_BOARD_SIZE)
+    parser.add_argument('--workers', type=int, default=4, help='processes to play games in; 1 plays inline')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--rotate', action='store_true', help='shift the seating every game')
+    args = parser.parse_args()
+
+    policies = args.policies.split(',')
+    unknown = [policy for policy in policies if policy not in POLICIES]
+    if unknown:
+        parser.error(f'unknown policies: {", ".join(unknown)}')
+    if not 2 <= len(policies) <= len(PLAYER_COLORS):
+        parser.error(f'between 2 and {len(PLAYER_COLORS)} policies are needed')
+    if not valid_board_size(args.board_size):
+        parser.error(f'the board size must be even, from {MIN_BOARD_SIZE} to {MAX_BOARD_SIZE}')
+
+    start = time.perf_counter()
+    results = simulate(args.games, policies, args.board_size, args.workers, args.seed, args.rotate)
+    summarize(results, time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    main()
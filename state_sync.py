@@ -0,0 +1,186 @@
+"""Numbered game_state_update messages that carry only what changed.
+
+Each update is diffed against the previous one: top-level fields are sent
+whole when their JSON differs, and the board and territory as flat
+[cell, value, cell, value, ...] lists of the cells that changed (cell is
+y * board_size + x; a territory value is the controllers' bitmask, bit p
+for player p, as in preview deltas). Every update names the sequence
+number it applies on top of, so a client that missed one sees the gap and
+asks for the full state instead. time_remaining ticks by itself, so it is
+sent with every update rather than diffed.
+
+Nothing is rebuilt while a game's state_version stays the same: updates for
+an unchanged version are empty without calling get_state(), and the full
+state is built once per sequence number and shared by every client that
+joins or resyncs, however many reconnect at once.
+
+Clients may ask for the binary encoding instead, where board and territory
+go out as Socket.IO binary attachments: a full state carries one piece code
+byte (see light_engine.piece_code) and one controller bitmask byte per cell,
+and an update carries a 3-byte record per changed cell, the cell as a
+little-endian uint16 followed by its new byte. Everything else stays JSON.
+"""
+import json
+import struct
+import threading
+
+from light_engine import PIECE_KINDS, piece_code
+
+# Sent as changed cells rather than whole
+GRID_FIELDS = ('board', 'territory')
+
+# Sent with every update, never diffed
+LIVE_FIELDS = ('time_remaining',)
+
+ENCODINGS = ('json', 'binary')
+
+_CHANGE = struct.Struct('<HB')
+
+
+def territory_masks(territory):
+    """Flatten rows of controller lists into one bitmask per cell"""
+    masks = []
+    for row in territory:
+        for controllers in row:
+            mask = 0
+            for player in controllers:
+                mask |= 1 << player
+            masks.append(mask)
+    return masks
+
+
+def cell_changes(old, new):
+    """Flat [cell, value, ...] list of the cells that differ; every cell when there is no old"""
+    changes = []
+    for cell, value in enumerate(new):
+        if old is None or old[cell] != value:
+            changes.append(cell)
+            changes.append(value)
+    return changes
+
+
+def encode_piece(piece):
+    """Piece code byte of a board cell as get_state() sends it"""
+    if piece is None:
+        return 0
+    return piece_code(PIECE_KINDS[piece['type']], piece['player'], piece['rotation'] // 90 % 4)
+
+
+def pack_changes(changes, encode):
+    """Pack a flat [cell, value, ...] list into 3-byte (cell, byte) records"""
+    packed = bytearray()
+    for i in range(0, len(changes), 2):
+        packed += _CHANGE.pack(changes[i], encode(changes[i + 1]))
+    return bytes(packed)
+
+
+def binary_update(update):
+    """An update from StateSync.update() with its board and territory changes packed"""
+    update = dict(update)
+    update['board'] = pack_changes(update['board'], encode_piece)
+    update['territory'] = pack_changes(update['territory'], int)
+    update['encoding'] = 'binary'
+    return update
+
+
+class StateSync:
+    """The last state sent for one game, and the sequence number of updates up to it"""
+
+    def __init__(self):
+        self.seq = 0
+        self.version = None  # state_version of the last update
+        self._fields = {}    # field -> JSON of its value as of seq
+        self._board = None
+        self._territory = None
+        self._full = {}      # encoding -> full() as of seq, built on first use
+        self._lock = threading.Lock()
+
+    def unchanged(self, version):
+        """The empty update when the last one was made at this state_version, else None"""
+        with self._lock:
+            if version != self.version:
+                return None
+            return self._empty()
+
+    def update(self, state):
+        """Record a get_state() result; returns the update from the previous one to it.
+
+        Nothing changed when the returned seq equals its base_seq; such an
+        update still tells a client which seq is current. A state older than
+        the last one recorded (built by a thread that lost the race to the
+        lock) is ignored that way, so clients are never rolled back.
+        """
+        board = [piece for row in state['board'] for piece in row]
+        territory = territory_masks(state['territory'])
+        fields = {key: json.dumps(value) for key, value in state.items()
+                  if key not in GRID_FIELDS and key not in LIVE_FIELDS}
+
+        with self._lock:
+            if self.version is not None and state['state_version'] < self.version:
+                update = self._empty()
+                update.update((key, state[key]) for key in LIVE_FIELDS)
+                return update
+
+            # Decoded from the JSON rather than taken from state, which shares the game's live objects
+            changes = {key: json.loads(encoded) for key, encoded in fields.items() if self._fields.get(key) != encoded}
+            board_changes = cell_changes(self._board, board)
+            territory_changes = cell_changes(self._territory, territory)
+
+            base_seq = self.seq
+            if changes or board_changes or territory_changes:
+                self.seq += 1
+                self._fields = fields
+                self._board = board
+                self._territory = territory
+                self._full = {}
+            self.version = state['state_version']
+
+            update = {
+                'seq': self.seq,
+                'base_seq': base_seq,
+                'changes': changes,
+                'board': board_changes,
+                'territory': territory_changes
+            }
+        for key in LIVE_FIELDS:
+            update[key] = state[key]
+        return update
+
+    def _empty(self):
+        return {'seq': self.seq, 'base_seq': self.seq, 'changes': {}, 'board': [], 'territory': []}
+
+    def full(self, encoding='json'):
+        """The whole state as of the latest update, for clients joining or resyncing; None before any.
+
+        The same dict is returned until the next change, so it must not be modified.
+        """
+        with self._lock:
+            if self._board is None:
+                return None
+            if encoding in self._full:
+                return self._full[encoding]
+            if encoding == 'binary':
+                state = dict(self._build_full())
+                state['board'] = bytes(encode_piece(piece) for piece in self._board)
+                state['territory'] = bytes(self._territory)
+                state['encoding'] = 'binary'
+            else:
+                state = self._build_full()
+            self._full[encoding] = state
+        return state
+
+    def _build_full(self):
+        state = self._full.get('json')
+        if state is None:
+            state = {key: json.loads(encoded) for key, encoded in self._fields.items()}
+            size = state['board_size']
+            state['board'] = [self._board[y * size:(y + 1) * size] for y in range(size)]
+            state['territory'] = [
+                [[player for player in range(len(state['players'])) if mask >> player & 1]
+                 for mask in self._territory[y * size:(y + 1) * size]]
+                for y in range(size)
+            ]
+            state['seq'] = self.seq
+            state['full'] = True
+            self._full['json'] = state
+        return state
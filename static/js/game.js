@@ -8,6 +8,12 @@ let boardOffsetX = 0;
 let boardOffsetY = 0;
 let myPlayerIndex = -1;
 let previewTerritory = null;
+let previewBundle = null;
+let legalTargets = null;
+let hintMoves = null;
+let stateSeq = 0;
+let gameManifest = null;
+let manifestRequest = null;
 let lightParticles = [];
 let animationFrame = null;
 let timeRemaining = 60;
@@ -113,9 +119,11 @@ function initGame(gameId, playerId) {
         connectionStatus = 'connected';
         updateConnectionStatus();
         
+        // Board and territory arrive as binary attachments rather than JSON
         socket.emit('join_game_room', {
             game_id: gameId,
-            player_id: playerId
+            player_id: playerId,
+            encoding: 'binary'
         });
         
         startHeartbeat();
@@ -138,42 +146,53 @@ function initGame(gameId, playerId) {
         updateConnectionStatus();
     });
     
-    socket.on('game_state_update', (state) => {
-        gameState = state;
-        
-        for (let i = 0; i < state.players.length; i++) {
-            if (state.players[i].id === playerId) {
-                myPlayerIndex = i;
-                break;
-            }
-        }
-
-        // Check if portal placement in progress
-        if (state.portal_placement_in_progress && 
-            state.portal_placement_in_progress.player === myPlayerIndex) {
-            portalPlacementInProgress = true;
-        } else {
-            portalPlacementInProgress = false;
+    socket.on('game_state_update', (update) => {
+        const state = applyStateUpdate(update);
+        if (!state) {
+            return;
         }
         
-        updateLightParticles();
-        
-        if (state.time_remaining !== undefined) {
-            timeRemaining = state.time_remaining;
-            updateTimerDisplay();
+        // Static fields come from the game manifest, fetched when it changes
+        if (!gameManifest || gameManifest.id !== state.manifest_id) {
+            loadManifest(state.manifest_id);
+            return;
         }
-        
-        updateUI();
-        renderBoard();
-        updateSessionActivity();
-
-        setTimeout(() => {
-            resizeCanvas();
-        }, 100);
+        Object.assign(state, gameManifest.fields);
+        showGameState(state);
     });
     
     socket.on('preview_update', (data) => {
-        previewTerritory = data.territory;
+        // Drop answers for an older state or a cell/piece the cursor has left
+        if (!gameState || data.version !== gameState.state_version ||
+            data.x !== canvas.hoverX || data.y !== canvas.hoverY ||
+            data.piece_type !== selectedPiece || data.rotation !== selectedRotation) {
+            return;
+        }
+        previewTerritory = applyTerritoryDelta(data.changes);
+        renderBoard();
+    });
+    
+    socket.on('preview_bundle', (bundle) => {
+        if (gameState && bundle.version === gameState.state_version) {
+            previewBundle = bundle;
+        }
+    });
+    
+    socket.on('hint', (data) => {
+        if (!gameState || data.state_version !== gameState.state_version) {
+            return;
+        }
+        hintMoves = {version: data.state_version, moves: data.hints};
+        if (data.hints.length === 0) {
+            showNotification(data.complete ? 'No placement gains you points right now'
+                : 'No placement could be checked in time', 'info');
+        } else {
+            const best = data.hints[0];
+            const gain = best.delta >= 0 ? '+' + best.delta : best.delta;
+            // On large boards only part of the placements fit in the time budget
+            const coverage = data.complete ? '' : `, best of ${data.scored} of ${data.candidates} checked`;
+            showNotification(`Hint: ${best.piece_type} at (${best.x}, ${best.y}), ${best.rotation}° (${gain} pts${coverage})`, 'info');
+        }
         renderBoard();
     });
     
@@ -212,6 +231,13 @@ function initGame(gameId, playerId) {
         });
     });
 
+    document.getElementById('hintBtn').addEventListener('click', () => {
+        socket.emit('request_hint', {
+            game_id: gameId,
+            player_id: playerId
+        });
+    });
+
     document.getElementById('cancelPortalBtn').addEventListener('click', () => {
         socket.emit('cancel_portal', {
             game_id: gameId,
@@ -726,6 +752,10 @@ function handleCanvasClick(e) {
     
     if (gridX >= 0 && gridX < gameState.board_size && gridY >= 0 && gridY < gameState.board_size) {
         if (pickupMode) {
+            if (legalTargets && !isLegalPickup(gridX, gridY)) {
+                showNotification("That piece can't be picked up right now", 'error');
+                return;
+            }
             pickupPiece(gridX, gridY);
         } else if (portalPlacementInProgress) {
             // If portal placement in progress, force portal placement
@@ -776,16 +806,13 @@ function handleCanvasHover(e) {
     
     if (gridX >= 0 && gridX < gameState.board_size && gridY >= 0 && gridY < gameState.board_size) {
         if (gameState.board[gridY][gridX] === null) {
-            // Check if valid based on piece type
-            let isValid = true;
+            const isValid = isLegalPlacement(gridX, gridY);
             
-            if (selectedPiece === 'blocker') {
-                isValid = !gameState.blocker_exclusion_zones.some(([px, py]) => px === gridX && py === gridY);
-            } else {
-                isValid = !gameState.protected_zones.some(([px, py]) => px === gridX && py === gridY);
-            }
-            
-            if (isValid) {
+            const bundled = bundledPreview(gridX, gridY);
+            if (bundled !== undefined) {
+                previewTerritory = bundled;
+                renderBoard();
+            } else if (isValid) {
                 socket.emit('request_preview', {
                     game_id: gameId,
                     player_id: playerId,
@@ -805,6 +832,246 @@ function handleCanvasHover(e) {
     }
 }
 
+// One flag per cell id from a hex bitmask (bit y * board_size + x)
+function decodeCellMask(hex, cells) {
+    const flags = new Uint8Array(cells);
+    for (let i = 0; i < hex.length; i++) {
+        const digit = parseInt(hex[hex.length - 1 - i], 16);
+        for (let bit = 0; bit < 4 && i * 4 + bit < cells; bit++) {
+            flags[i * 4 + bit] = (digit >> bit) & 1;
+        }
+    }
+    return flags;
+}
+
+// Whether the selected piece may be placed at (x, y) right now
+function isLegalPlacement(x, y) {
+    if (!legalTargets || !legalTargets.place[selectedPiece]) {
+        return false;
+    }
+    return legalTargets.place[selectedPiece][y * gameState.board_size + x] === 1;
+}
+
+// Whether the piece at (x, y) may be picked up right now
+function isLegalPickup(x, y) {
+    return legalTargets.pickup[y * gameState.board_size + x] === 1;
+}
+
+// Territory with the selected piece at (x, y) from the preview bundle: null when
+// the placement is not legal, undefined when there is no bundle to ask
+function bundledPreview(x, y) {
+    if (!previewBundle || previewBundle.version !== gameState.state_version) {
+        return undefined;
+    }
+    
+    const rotations = previewBundle.rotations[selectedPiece];
+    if (!rotations) {
+        return null;
+    }
+    
+    const boardSize = gameState.board_size;
+    const preview = previewBundle.previews[selectedPiece][rotations[(selectedRotation / 90) % 4]];
+    const delta = preview[y * boardSize + x];
+    if (!delta) {
+        return null;
+    }
+    
+    return applyTerritoryDelta(delta);
+}
+
+function showGameState(state) {
+    for (let i = 0; i < state.players.length; i++) {
+        if (state.players[i].id === playerId) {
+            myPlayerIndex = i;
+            break;
+        }
+    }
+
+    // Previews are only valid for the state they were computed on
+    if (previewBundle && previewBundle.version !== state.state_version) {
+        previewBundle = null;
+    }
+    if (hintMoves && hintMoves.version !== state.state_version) {
+        hintMoves = null;
+    }
+    if (state.state === 'playing' && state.current_player === myPlayerIndex && !previewBundle) {
+        socket.emit('request_preview_bundle', {
+            game_id: gameId,
+            player_id: playerId
+        });
+    }
+
+    // The mover's legal targets, decoded once per state for constant-time lookups
+    legalTargets = null;
+    if (state.legal_moves && state.legal_moves.player === myPlayerIndex) {
+        const cells = state.board_size * state.board_size;
+        legalTargets = {place: {}, pickup: decodeCellMask(state.legal_moves.pickup, cells)};
+        for (const [pieceType, mask] of Object.entries(state.legal_moves.place)) {
+            legalTargets.place[pieceType] = decodeCellMask(mask, cells);
+        }
+    }
+
+    // Check if portal placement in progress
+    if (state.portal_placement_in_progress && 
+        state.portal_placement_in_progress.player === myPlayerIndex) {
+        portalPlacementInProgress = true;
+    } else {
+        portalPlacementInProgress = false;
+    }
+    
+    updateLightParticles();
+    
+    if (state.time_remaining !== undefined) {
+        timeRemaining = state.time_remaining;
+        updateTimerDisplay();
+    }
+    
+    updateUI();
+    renderBoard();
+    updateSessionActivity();
+
+    setTimeout(() => {
+        resizeCanvas();
+    }, 100);
+}
+
+// The manifest is revalidated by ETag, so reloading an unchanged one is cheap
+function loadManifest(manifestId) {
+    if (manifestRequest === manifestId) {
+        return;
+    }
+    manifestRequest = manifestId;
+    fetch(`/game/${gameId}/manifest`)
+        .then(response => response.json().then(fields => {
+            const etag = (response.headers.get('ETag') || '').replace(/"/g, '');
+            gameManifest = {id: etag || manifestId, fields: fields};
+            manifestRequest = null;
+            if (gameState && gameState.manifest_id === gameManifest.id) {
+                Object.assign(gameState, fields);
+                showGameState(gameState);
+            }
+        }))
+        .catch(() => {
+            manifestRequest = null;
+        });
+}
+
+// Updates carry only what changed since the update numbered base_seq;
+// returns the new state, or null when the update cannot be applied
+function applyStateUpdate(update) {
+    if (update.full) {
+        if (update.encoding === 'binary') {
+            update = decodeBinaryUpdate(update);
+        }
+        stateSeq = update.seq;
+        gameState = update;
+        return gameState;
+    }
+    if (!gameState || update.base_seq !== stateSeq) {
+        // Older than what we have, or we missed one: fetch the whole state
+        if (update.seq > stateSeq) {
+            socket.emit('request_state_resync', {
+                game_id: gameId,
+                player_id: playerId
+            });
+        }
+        return null;
+    }
+    if (update.encoding === 'binary') {
+        update = decodeBinaryUpdate(update);
+    }
+    
+    Object.assign(gameState, update.changes);
+    const boardSize = gameState.board_size;
+    for (let i = 0; i < update.board.length; i += 2) {
+        const cell = update.board[i];
+        gameState.board[Math.floor(cell / boardSize)][cell % boardSize] = update.board[i + 1];
+    }
+    gameState.territory = applyTerritoryDelta(update.territory);
+    gameState.time_remaining = update.time_remaining;
+    stateSeq = update.seq;
+    return gameState;
+}
+
+const PIECE_TYPES = [null, 'mirror', 'prism', 'splitter', 'blocker', 'portal'];
+
+// A board cell from its piece code byte: kind in bits 0-2, rotation in 3-4, owner in 5-7
+function decodePiece(code, players) {
+    if (!code) {
+        return null;
+    }
+    const player = code >> 5;
+    const piece = {
+        type: PIECE_TYPES[code & 7],
+        player: player,
+        rotation: ((code >> 3) & 3) * 90,
+        color: players[player].color
+    };
+    if (piece.type === 'portal') {
+        piece.pair_id = player;
+    }
+    return piece;
+}
+
+// Turn a binary-encoded update back into the JSON form: full states carry a
+// byte per cell, updates 3-byte records of a little-endian cell and its byte
+function decodeBinaryUpdate(update) {
+    const board = new Uint8Array(update.board);
+    const territory = new Uint8Array(update.territory);
+    
+    if (update.full) {
+        const size = update.board_size;
+        update.board = [];
+        update.territory = [];
+        for (let y = 0; y < size; y++) {
+            const boardRow = [];
+            const territoryRow = [];
+            for (let x = 0; x < size; x++) {
+                boardRow.push(decodePiece(board[y * size + x], update.players));
+                const controllers = [];
+                for (let p = 0; p < update.players.length; p++) {
+                    if (territory[y * size + x] & (1 << p)) {
+                        controllers.push(p);
+                    }
+                }
+                territoryRow.push(controllers);
+            }
+            update.board.push(boardRow);
+            update.territory.push(territoryRow);
+        }
+        return update;
+    }
+    
+    const players = update.changes.players || gameState.players;
+    update.board = [];
+    for (let i = 0; i + 2 < board.length; i += 3) {
+        update.board.push(board[i] | (board[i + 1] << 8), decodePiece(board[i + 2], players));
+    }
+    update.territory = [];
+    for (let i = 0; i + 2 < territory.length; i += 3) {
+        update.territory.push(territory[i] | (territory[i + 1] << 8), territory[i + 2]);
+    }
+    return update;
+}
+
+// Committed territory with [cell id, controller bitmask, ...] changes laid over it
+function applyTerritoryDelta(delta) {
+    const boardSize = gameState.board_size;
+    const territory = gameState.territory.map(row => row.slice());
+    for (let i = 0; i < delta.length; i += 2) {
+        const cell = delta[i];
+        const mask = delta[i + 1];
+        const controllers = [];
+        for (let p = 0; p < gameState.players.length; p++) {
+            if (mask & (1 << p)) {
+                controllers.push(p);
+            }
+        }
+        territory[Math.floor(cell / boardSize)][cell % boardSize] = controllers;
+    }
+    return territory;
+}
+
 function pickupPiece(x, y) {
     socket.emit('pickup_piece', {
         game_id: gameId,
@@ -936,6 +1203,8 @@ function renderBoard() {
     drawCenterZone();
     drawLightSources();
     drawPieces();
+    drawHints();
+    drawPickupTargets();
     
     if (canvas.hoverX !== undefined && canvas.hoverY !== undefined && 
         gameState.current_player === myPlayerIndex && selectedPiece && !pickupMode) {
@@ -943,6 +1212,54 @@ function renderBoard() {
     }
 }
 
+function drawHints() {
+    if (!hintMoves || gameState.current_player !== myPlayerIndex) return;
+    
+    // Best hint brightest; each shows its score change
+    hintMoves.moves.forEach((hint, rank) => {
+        ctx.globalAlpha = 1 - rank * 0.15;
+        ctx.strokeStyle = '#ffd700';
+        ctx.lineWidth = rank === 0 ? 3 : 2;
+        ctx.setLineDash([4, 3]);
+        ctx.strokeRect(
+            boardOffsetX + hint.x * cellSize + 3,
+            boardOffsetY + hint.y * cellSize + 3,
+            cellSize - 6,
+            cellSize - 6
+        );
+        ctx.setLineDash([]);
+        
+        ctx.fillStyle = '#ffd700';
+        ctx.font = 'bold 10px Arial';
+        ctx.textAlign = 'right';
+        ctx.textBaseline = 'top';
+        ctx.fillText((hint.delta >= 0 ? '+' : '') + hint.delta,
+            boardOffsetX + (hint.x + 1) * cellSize - 4,
+            boardOffsetY + hint.y * cellSize + 4
+        );
+    });
+    ctx.globalAlpha = 1;
+}
+
+function drawPickupTargets() {
+    if (!pickupMode || !legalTargets || gameState.current_player !== myPlayerIndex) return;
+    
+    // Outline the pieces a click would pick up
+    const boardSize = gameState.board_size;
+    ctx.strokeStyle = '#ffffff';
+    ctx.lineWidth = 2;
+    legalTargets.pickup.forEach((legal, cell) => {
+        if (legal) {
+            ctx.strokeRect(
+                boardOffsetX + (cell % boardSize) * cellSize + 2,
+                boardOffsetY + Math.floor(cell / boardSize) * cellSize + 2,
+                cellSize - 4,
+                cellSize - 4
+            );
+        }
+    });
+}
+
 function shouldDrawBeam(playerIdx) {
     if (!showOtherPlayers && playerIdx !== myPlayerIndex) {
         return false;
@@ -1103,9 +1420,9 @@ function drawLightSources() {
 function drawCenterZone() {
     if (!gameState) return;
     
-    // For 16x16 board, center is (7,7), (8,7), (7,8), (8,8)
-    const centerX = 7;
-    const centerY = 7;
+    // Center 2x2, e.g. (7,7), (8,7), (7,8), (8,8) on a 16x16 board
+    const centerX = Math.floor(gameState.board_size / 2) - 1;
+    const centerY = centerX;
     const centerSize = 2; // 2x2 area
     
     ctx.strokeStyle = 'rgba(255, 215, 0, 0.4)'; // Subtle gold
@@ -1248,21 +1565,11 @@ function drawHoverPreview(x, y) {
         return;
     }
     
-    if (gameState.board[y][x] !== null) {
+    // Covers occupancy, zones, the portal border rule, inventory and energy
+    if (!isLegalPlacement(x, y)) {
         return;
     }
     
-    // Check appropriate zone based on piece type
-    if (selectedPiece === 'blocker') {
-        if (gameState.blocker_exclusion_zones && gameState.blocker_exclusion_zones.some(([px, py]) => px === x && py === y)) {
-            return;
-        }
-    } else {
-        if (gameState.protected_zones && gameState.protected_zones.some(([px, py]) => px === x && py === y)) {
-            return;
-        }
-    }
-    
     const centerX = boardOffsetX + (x + 0.5) * cellSize;
     const centerY = boardOffsetY + (y + 0.5) * cellSize;
     const size = cellSize * 0.6;
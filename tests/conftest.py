@@ -0,0 +1,36 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import layouts  # noqa: E402
+import transpositions  # noqa: E402
+from game_logic import PrismWarsGame  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def fresh_transpositions():
+    """Every test traces its own positions instead of reading ones an earlier test cached"""
+    transpositions.shared.clear()
+    yield
+    transpositions.shared.clear()
+
+
+@pytest.fixture
+def make_game():
+    """Build a started game the way simulate.play_game() does"""
+    def make(num_players=2, board_size=layouts.CLASSIC_BOARD_SIZE, seed=0):
+        game = PrismWarsGame(f'TEST{seed}', num_players, board_size)
+        game.rng = random.Random(seed)
+        game.players = [
+            {'id': str(i), 'username': f'Seat {i + 1}', 'color': layouts.PLAYER_COLORS[i], 'ready': True}
+            for i in range(num_players)
+        ]
+        game.initialize_board()
+        game.state = 'playing'
+        return game
+    return make
+
@@ -0,0 +1,29 @@
+"""Helpers shared by the tests"""
+from light_engine import mask_cells
+
+
+def lit_mask(game):
+    mask = 0
+    for player_mask in game.engine.trace()['player_masks']:
+        mask |= player_mask
+    return mask
+
+
+def random_move(game, rng, on_beams=False):
+    """A uniformly random legal move of the current player; placements only on lit cells when on_beams"""
+    legal = game.legal_moves()
+    within = lit_mask(game) if on_beams else -1
+    moves = []
+    for piece_type, mask in legal['place'].items():
+        for x, y in mask_cells(mask & within, game.board_size):
+            moves.append(('place', x, y, piece_type, rng.choice([0, 90, 180, 270])))
+    if not on_beams:
+        moves.extend(('pickup', x, y) for x, y in mask_cells(legal['pickup'], game.board_size))
+    if not moves or (not on_beams and not game.portal_placement_in_progress and rng.random() < 0.1):
+        moves.append(('pass',))
+    return rng.choice(moves)
+
+
+def trace_fields(trace):
+    """The parts of a trace that territory, scoring and the client read"""
+    return {key: trace[key] for key in ('player_masks', 'segments', 'beam_lengths', 'mirror_chains')}
@@ -0,0 +1,39 @@
+import random
+
+import pytest
+
+from batch_engine import evaluate_placements, evaluate_placements_reference
+from light_engine import mask_cells
+from support import lit_mask, random_move
+
+np = pytest.importorskip('numpy')
+
+
+def place_portal_pair(game, rng):
+    """The current player pairs two border cells, on a beam where possible"""
+    game.player_energy[game.current_player] += game.piece_costs['portal']
+    for _ in range(2):
+        border = game.legal_moves()['place']['portal']
+        cells = mask_cells(border & lit_mask(game), game.board_size) or mask_cells(border, game.board_size)
+        x, y = rng.choice(cells)
+        assert game.make_move(('place', x, y, 'portal', 0))[0]
+
+
+@pytest.mark.parametrize('num_players, seed', [(2, 0), (3, 1), (4, 2)])
+def test_batch_matches_the_reference(make_game, num_players, seed):
+    rng = random.Random(seed)
+    game = make_game(num_players, seed=seed)
+    for _ in range(8):
+        game.make_move(random_move(game, rng, on_beams=True))
+    place_portal_pair(game, rng)
+    place_portal_pair(game, rng)
+
+    size = game.board_size
+    candidates = [(x, y, piece_type, rng.choice([0, 90, 180, 270]))
+                  for y in range(size) for x in range(size)
+                  for piece_type in ('mirror', 'splitter', 'portal', None)]
+    for player_idx in range(num_players):
+        batch = evaluate_placements(game, candidates, player_idx)
+        reference = evaluate_placements_reference(game, candidates, player_idx)
+        assert batch['territory'].tolist() == reference['territory']
+        assert batch['base_scores'].tolist() == reference['base_scores']
@@ -0,0 +1,76 @@
+import random
+import time
+
+import bots
+from support import random_move
+
+
+def test_pool_worker_chooses_a_legal_move(make_game):
+    game = make_game(seed=4)
+    game.players[1]['bot'] = 'easy'
+    game.make_move(('pass',))
+
+    pool = bots.BotPool(1)
+    move, stats = pool.submit(game, 1).result(timeout=120)
+    legal = game.legal_moves(1)
+    if move[0] == 'place':
+        assert legal['place'][move[3]] >> (move[2] * game.board_size + move[1]) & 1
+    elif move[0] == 'pickup':
+        assert legal['pickup'] >> (move[2] * game.board_size + move[1]) & 1
+    else:
+        assert move == ('pass',)
+    assert stats['cpu_ms'] >= 0
+
+
+def test_rank_keeps_every_move_within_its_budget(make_game):
+    game = make_game(seed=6)
+    moves = bots.candidate_moves(game, 0)
+    search = bots._Search(game, 0, {}, time.thread_time() + 10, random.Random(0))
+    ranked, count = search.rank(0, moves, budget=0)
+    assert sorted(ranked) == sorted(moves)
+    assert ranked[count:] == [move for move in moves if move not in ranked[:count]]
+
+
+def test_hints_report_whether_every_candidate_was_scored(make_game):
+    rng = random.Random(6)
+    game = make_game(seed=6)
+    for _ in range(6):
+        game.make_move(random_move(game, rng, on_beams=True))
+
+    mover = game.current_player
+    full = bots.rank_hints(game, mover, count=3, budget=float('inf'))
+    assert full['complete'] and full['scored'] == full['candidates'] > 0
+
+    partial = bots.rank_hints(game, mover, count=3, budget=0)
+    assert not partial['complete'] and partial['scored'] < partial['candidates']
+
+    base = game.calculate_detailed_scores()[mover]['total']
+    best = full['hints'][0]
+    assert game.make_move(('place', best['x'], best['y'], best['piece_type'], best['rotation']))[0]
+    assert game.calculate_detailed_scores()[mover]['total'] - base == best['delta']
+
+
+def test_search_scores_a_transposed_position_once(make_game, monkeypatch):
+    game = make_game(seed=7)
+    game.player_energy[0] = 100
+    placements = [move for move in bots.candidate_moves(game, 0) if move[0] == 'place']
+    first = placements[0]
+    second = next(move for move in placements if move[1:3] != first[1:3])
+    search = bots._Search(game, 0, {}, time.thread_time() + 10, random.Random(0))
+
+    scored = []
+    calculate = game.calculate_detailed_scores
+    monkeypatch.setattr(game, 'calculate_detailed_scores', lambda: scored.append(1) or calculate())
+    values = []
+    evaluated = []
+    for order in ((first, second), (second, first)):
+        for move in (order[0], ('pass',), order[1]):
+            assert game.make_move(move)[0]
+        before = len(scored)
+        values.append(search.evaluate(0))
+        evaluated.append(len(scored) - before)
+        for _ in range(3):
+            game.unmake_move()
+    assert values[0] == values[1]
+    assert evaluated == [1, 0] and search.nodes == 2
+
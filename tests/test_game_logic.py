@@ -0,0 +1,84 @@
+import random
+
+import pytest
+
+import zobrist
+from light_engine import PIECE_KINDS
+from support import random_move, trace_fields
+
+
+def assert_moves_follow_legal_moves(game):
+    """Every placement and pickup succeeds exactly where legal_moves() has its bit set"""
+    legal = game.legal_moves()
+    size = game.board_size
+    for cell in range(size * size):
+        x, y = cell % size, cell // size
+        moves = [(('place', x, y, piece_type, 90), legal['place'][piece_type]) for piece_type in PIECE_KINDS]
+        moves.append((('pickup', x, y), legal['pickup']))
+        for move, mask in moves:
+            success, message = game.make_move(move)
+            assert success == bool(mask >> cell & 1), (move, message)
+            if success:
+                game.unmake_move()
+
+
+@pytest.mark.parametrize('num_players, seed', [(2, 0), (3, 1)])
+def test_place_and_pickup_follow_legal_moves(make_game, num_players, seed):
+    rng = random.Random(seed)
+    game = make_game(num_players, seed=seed)
+    for _ in range(16):
+        if game.state != 'playing':
+            break
+        assert_moves_follow_legal_moves(game)
+        game.make_move(random_move(game, rng))
+
+
+def test_portal_cannot_replace_a_piece_on_the_border(make_game):
+    game = make_game()
+    game.player_energy[0] = 20
+    assert game.make_move(('place', 0, 3, 'portal', 0))[0]
+    assert game.make_move(('place', 0, 9, 'portal', 0))[0]
+
+    game.player_energy[1] = 20
+    assert game.place_piece(0, 3, 'portal') == (False, "Cell already occupied")
+    assert game.portal_pairs[0] == {'portal_a': (0, 3), 'portal_b': (0, 9)}
+    assert game.board.owner(0, 3) == 0
+
+
+def snapshot(game):
+    """Everything make_move() may change, in comparable form"""
+    return game.to_dict(), game.position_hash(), trace_fields(game.engine.current())
+
+
+@pytest.mark.parametrize('num_players, board_size, seed', [(2, 16, 0), (3, 16, 1), (4, 24, 2)])
+def test_make_and_unmake_round_trip(make_game, num_players, board_size, seed):
+    rng = random.Random(seed)
+    game = make_game(num_players, board_size, seed)
+    game.max_rounds = 8
+    history = []
+    for _ in range(200):
+        if history and (game.state != 'playing' or rng.random() < 0.3):
+            expected = history.pop()
+            assert game.unmake_move()[0]
+            assert snapshot(game) == expected
+            continue
+        before = snapshot(game)
+        if game.make_move(random_move(game, rng))[0]:
+            history.append(before)
+            assert game.position_hash() == zobrist.game_hash(game)
+        else:
+            assert snapshot(game) == before
+
+    while history:
+        expected = history.pop()
+        game.unmake_move()
+        assert snapshot(game) == expected
+
+
+def test_reconnection_keeps_the_position_a_bot_move_was_chosen_for(make_game):
+    game = make_game()
+    position = game.position_hash()
+    game.handle_reconnection(1)
+    assert game.position_hash() == position
+    game.next_turn()
+    assert game.position_hash() != position
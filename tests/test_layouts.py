@@ -0,0 +1,20 @@
+import layouts
+
+
+def test_only_even_sizes_in_range_are_valid():
+    assert layouts.valid_board_size(layouts.CLASSIC_BOARD_SIZE)
+    assert layouts.valid_board_size(layouts.MIN_BOARD_SIZE)
+    assert layouts.valid_board_size(layouts.MAX_BOARD_SIZE)
+    assert not layouts.valid_board_size(17)
+    assert not layouts.valid_board_size(layouts.MIN_BOARD_SIZE - 2)
+    assert not layouts.valid_board_size(layouts.MAX_BOARD_SIZE + 2)
+
+
+def test_every_valid_size_lays_out_every_player_count(make_game):
+    for size in range(layouts.MIN_BOARD_SIZE, layouts.MAX_BOARD_SIZE + 1):
+        if not layouts.valid_board_size(size):
+            continue
+        for num_players in range(2, layouts.MAX_PLAYERS + 1):
+            game = make_game(num_players, size)
+            cells = [(s['x'], s['y'], s['direction']) for s in game.light_sources]
+            assert len(set(cells)) == len(cells) == 2 * num_players
@@ -0,0 +1,101 @@
+import random
+
+import pytest
+
+import transpositions
+from light_engine import CODE_KIND, CODE_OWNER, CODE_TRANSITIONS, DIRECTION_IDS, DX, DY, PORTAL, mask_cells
+from support import lit_mask, random_move, trace_fields
+
+
+def test_second_game_on_a_layout_traces_its_own_board(make_game):
+    rng = random.Random(3)
+    first = make_game(seed=1)
+    # The first game's board is no longer empty when it is first traced
+    for _ in range(6):
+        assert first.make_move(random_move(first, rng, on_beams=True))[0]
+    assert any(first.board.pieces())
+    first.engine.current()
+
+    second = make_game(seed=2)
+    assert trace_fields(second.engine.current()) == trace_fields(second.engine.trace())
+
+
+@pytest.mark.parametrize('num_players, board_size, seed', [(2, 16, 0), (4, 16, 1), (3, 24, 2), (2, 32, 3)])
+def test_incremental_trace_matches_a_fresh_trace(make_game, num_players, board_size, seed):
+    rng = random.Random(seed)
+    game = make_game(num_players, board_size, seed)
+    for _ in range(120):
+        if game.state != 'playing':
+            break
+        game.make_move(random_move(game, rng))
+        assert trace_fields(game.engine.current()) == trace_fields(game.engine.trace())
+
+
+def beam_depth(game, source):
+    """Reference beam length: breadth-first over (cell, direction) states, deepest state in cells"""
+    size = game.board_size
+    direction = DIRECTION_IDS[source['direction']]
+    frontier = [(source['x'], source['y'], direction)]
+    seen = set()
+    depth = 0
+    while True:
+        entered = []
+        for x, y, direction in frontier:
+            x, y = x + DX[direction], y + DY[direction]
+            if 0 <= x < size and 0 <= y < size and (x, y, direction) not in seen:
+                seen.add((x, y, direction))
+                entered.append((x, y, direction))
+        if not entered:
+            return depth
+        depth += 1
+        frontier = []
+        for x, y, direction in entered:
+            code = game.board.cells[y * size + x]
+            outgoing = CODE_TRANSITIONS[code][direction]
+            if CODE_KIND[code] == PORTAL and outgoing:
+                pair = game.portal_pairs.get(CODE_OWNER[code])
+                if not pair or (x, y) not in (pair['portal_a'], pair['portal_b']):
+                    continue
+                x, y = pair['portal_b'] if (x, y) == pair['portal_a'] else pair['portal_a']
+                outgoing = outgoing[:1]
+            frontier.extend((x, y, new_dir) for new_dir in outgoing)
+
+
+@pytest.mark.parametrize('seed', [0, 1])
+def test_beam_length_is_the_deepest_path_from_the_source(make_game, seed):
+    rng = random.Random(seed)
+    game = make_game(3, 16, seed)
+    # Enough pieces for branches to cross and reach states by paths of different lengths
+    game.player_energy = [1000] * 3
+    game.player_inventory = [{piece_type: 50 for piece_type in inventory} for inventory in game.player_inventory]
+    game.max_rounds = game.win_points = 1000
+    for move in range(150):
+        game.make_move(random_move(game, rng, on_beams=True))
+        if move % 10 == 9:
+            assert game.engine.current()['beam_lengths'] == [
+                0 if source['player'] in game.disconnected_players else beam_depth(game, source)
+                for source in game.light_sources]
+
+
+def test_board_changed_during_a_trace_is_not_shared(make_game, monkeypatch):
+    game = make_game(seed=6)
+    game.engine.current()
+    x, y = mask_cells(game.legal_moves()['place']['blocker'] & lit_mask(game), game.board_size)[0]
+    game.engine.invalidate_player(0)
+    transpositions.shared.clear()
+    before = transpositions.position_key(game)
+
+    # Another thread places a blocker while the engine is tracing; its invalidation comes after
+    trace_source = game.engine._trace_source
+    def trace_while_placing(source, cells=None):
+        if game.board.is_empty(x, y):
+            game.board.place(x, y, 'blocker', 0)
+        return trace_source(source, cells)
+    monkeypatch.setattr(game.engine, '_trace_source', trace_while_placing)
+    assert game.engine.current_with_key()[0] is None
+    monkeypatch.undo()
+
+    assert before not in transpositions.shared
+    assert transpositions.position_key(game) not in transpositions.shared
+    game._bump_version([(x, y)])
+    assert trace_fields(game.engine.current()) == trace_fields(game.engine.trace())
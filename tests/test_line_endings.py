@@ -0,0 +1,22 @@
+import os
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE_EXTENSIONS = ('.py', '.js', '.html', '.css')
+SKIPPED_DIRECTORIES = ('__pycache__', 'venv', 'node_modules')
+
+
+def source_files():
+    for directory, subdirectories, files in os.walk(ROOT):
+        subdirectories[:] = [d for d in subdirectories if not d.startswith('.') and d not in SKIPPED_DIRECTORIES]
+        for name in files:
+            if name.endswith(SOURCE_EXTENSIONS):
+                yield os.path.relpath(os.path.join(directory, name), ROOT)
+
+
+@pytest.mark.parametrize('path', sorted(source_files()))
+def test_source_files_use_crlf(path):
+    with open(os.path.join(ROOT, path), 'rb') as f:
+        data = f.read()
+    assert data.count(b'\n') == data.count(b'\r\n'), f'{path} has LF line endings; the sources use CRLF'
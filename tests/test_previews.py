@@ -0,0 +1,75 @@
+import random
+import time
+
+import pytest
+
+from light_engine import neighbourhood_mask
+from previews import PREWARM_CANDIDATES, PreviewThrottle, rotation_classes
+from support import lit_mask, random_move
+
+
+def drain(throttle, client):
+    served = []
+    while True:
+        request, wait = throttle.next(client)
+        if request is None:
+            if not wait:
+                return served
+            time.sleep(wait)
+            continue
+        served.append(request)
+
+
+def test_throttle_serves_the_newest_request_once_a_token_refills():
+    throttle = PreviewThrottle(rate=50.0, burst=1)
+    assert throttle.submit('a', 1)
+    assert throttle.next('a') == (1, 0)
+
+    # The bucket is empty: the request waits instead of being dropped
+    assert not throttle.submit('a', 2)
+    request, wait = throttle.next('a')
+    assert request is None and 0 < wait <= 1 / 50.0
+
+    # A newer request replaces it, and that one is served after the wait
+    assert not throttle.submit('a', 3)
+    assert drain(throttle, 'a') == [3]
+    stats = throttle.stats()
+    assert stats['superseded'] == 1
+    assert stats['rate_limited'] >= 1
+
+
+def test_throttle_drains_each_client_once():
+    throttle = PreviewThrottle(rate=1000.0, burst=5)
+    assert throttle.submit('a', 1)
+    assert not throttle.submit('a', 2)
+    assert throttle.submit('b', 1)
+    assert drain(throttle, 'a') == [2]
+    assert drain(throttle, 'b') == [1]
+    assert throttle.submit('a', 4)
+    throttle.forget('a')
+    assert throttle.next('a') == (None, 0)
+
+
+def test_prewarm_spreads_a_few_previews_over_every_piece_type(make_game):
+    pytest.importorskip('numpy')
+    rng = random.Random(4)
+    game = make_game(4, 32, seed=4)
+    for _ in range(6):
+        game.make_move(random_move(game, rng, on_beams=True))
+    assert game.state == 'playing'
+    game.prewarm_previews()
+
+    keys = list(game.preview_cache._entries)
+    assert 0 < len(keys) <= PREWARM_CANDIDATES
+    near = neighbourhood_mask(lit_mask(game), game.board_size)
+    hoverable = {piece_type for piece_type, mask in game.legal_moves()['place'].items() if mask & near}
+    assert {key[3] for key in keys} == hoverable
+
+    # One entry per rotation class serves every rotation in it
+    version, x, y, piece_type, rotation = keys[-1]
+    distinct, index = rotation_classes(piece_type)
+    same_class = [q * 90 for q in range(4) if distinct[index[q]] * 90 == rotation]
+    warmed = [game.calculate_light_paths_with_preview(x, y, piece_type, r) for r in same_class]
+    assert game.preview_cache.stats()['hits'] == len(same_class)
+    game.preview_cache.clear()
+    assert warmed == [game.calculate_light_paths_with_preview(x, y, piece_type, r) for r in same_class]
@@ -0,0 +1,113 @@
+import json
+import random
+import struct
+
+from state_sync import StateSync, binary_update, encode_piece, territory_masks
+from support import random_move
+
+
+def comparable(state):
+    """A state as the client keeps it: JSON types, territory as bitmasks, no per-message fields"""
+    state = json.loads(json.dumps(state))
+    state['territory'] = territory_masks(state['territory'])
+    for key in ('seq', 'full', 'time_remaining'):
+        state.pop(key, None)
+    return state
+
+
+def apply_update(client, update):
+    """Apply a JSON update the way static/js/game.js does; False when a resync is needed"""
+    if update['seq'] == update['base_seq']:
+        return True
+    if update['base_seq'] != client['seq']:
+        return False
+    client.update(json.loads(json.dumps(update['changes'])))
+    size = client['board_size']
+    board = update['board']
+    for i in range(0, len(board), 2):
+        client['board'][board[i] // size][board[i] % size] = board[i + 1]
+    territory = update['territory']
+    for i in range(0, len(territory), 2):
+        cell, mask = territory[i], territory[i + 1]
+        client['territory'][cell // size][cell % size] = [p for p in range(len(client['players'])) if mask >> p & 1]
+    client['seq'] = update['seq']
+    return True
+
+
+def test_json_updates_replay_to_the_current_state(make_game):
+    rng = random.Random(7)
+    game = make_game(3, seed=7)
+    client = json.loads(json.dumps(game.get_full_state()))
+    late = None
+    for step in range(40):
+        if game.state != 'playing':
+            break
+        game.make_move(random_move(game, rng))
+        update = game.get_state_update()
+        if step == 10:
+            # A client that missed this update sees the gap on the next one and resyncs
+            late = json.loads(json.dumps(client))
+        elif late is not None and not apply_update(late, update):
+            late = json.loads(json.dumps(game.get_full_state()))
+        assert apply_update(client, update)
+        assert comparable(client) == comparable(game.get_state())
+    assert comparable(late) == comparable(game.get_state())
+
+
+def test_older_state_is_ignored(make_game):
+    game = make_game(seed=8)
+    stale = game.get_state()
+    game.make_move(('pass',))
+    sync = StateSync()
+    current = sync.update(game.get_state())
+
+    update = sync.update(stale)
+    assert update['seq'] == update['base_seq'] == current['seq']
+    assert sync.version == game.state_version
+    assert comparable(sync.full()) == comparable(game.get_state())
+
+
+def apply_binary_update(client, update):
+    """Apply a binary update: 3-byte (uint16 cell, byte) records for board and territory"""
+    if update['seq'] == update['base_seq']:
+        return True
+    if update['base_seq'] != client['seq']:
+        return False
+    client.update(json.loads(json.dumps(update['changes'])))
+    for field in ('board', 'territory'):
+        for cell, value in struct.iter_unpack('<HB', update[field]):
+            client[field][cell] = value
+    client['seq'] = update['seq']
+    return True
+
+
+def binary_comparable(state):
+    state = dict(state)
+    state['board'] = list(state['board'])
+    state['territory'] = list(state['territory'])
+    for key in ('seq', 'full', 'time_remaining', 'encoding'):
+        state.pop(key, None)
+    return state
+
+
+def expected_binary(game):
+    state = comparable(game.get_state())
+    state['board'] = [encode_piece(piece) for row in game.get_state()['board'] for piece in row]
+    return state
+
+
+def test_binary_updates_replay_to_the_current_state(make_game):
+    rng = random.Random(9)
+    game = make_game(4, seed=9)
+    full = game.get_full_state('binary')
+    client = dict(full, board=bytearray(full['board']), territory=bytearray(full['territory']))
+    for _ in range(40):
+        if game.state != 'playing':
+            break
+        game.make_move(random_move(game, rng))
+        assert apply_binary_update(client, binary_update(game.get_state_update()))
+        assert binary_comparable(client) == expected_binary(game)
+
+    full = game.get_full_state('binary')
+    assert full['seq'] == client['seq']
+    assert binary_comparable(full) == expected_binary(game)
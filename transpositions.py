@@ -0,0 +1,91 @@
+"""Process-wide cache of traced positions, shared by every game on the server.
+
+A trace only depends on the board, the light sources (and which of them are
+active) and the portal pairs, so the same position reached in any game is
+traced once: the empty board of each layout, common openings, and positions
+revisited by pickup and replace cycles or by make_move/unmake_move searches.
+Score breakdowns are cached next to them, keyed by the position plus what
+scoring adds on top (amplifier tiles, objectives, disconnected players).
+
+Keys hold the packed board itself rather than a 64-bit hash of it, so two
+positions can never be confused; the dict does the hashing.
+"""
+from collections import OrderedDict
+import threading
+
+
+class LRUCache:
+    """Bounded LRU safe to share between threads, with hit and miss counters for sizing it.
+
+    Used for traced positions here and for each game's previews (see
+    previews.PreviewCache). None is never stored, as get() returns it for a miss.
+    """
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+
+# The one cache every game's LightEngine and score breakdown goes through
+shared = LRUCache()
+
+
+def position_key(game, cells=None):
+    """Everything a trace depends on: board size and cells, light sources and portal pairs"""
+    if cells is None:
+        cells = game.board.cells
+    disconnected = game.disconnected_players
+    sources = tuple((s['x'], s['y'], s['direction'], s['player'], s['color'], s['player'] in disconnected)
+                    for s in game.light_sources)
+    pairs = tuple(sorted((player_idx, pair['portal_a'], pair['portal_b'])
+                         for player_idx, pair in game.portal_pairs.items()))
+    return (game.board_size, bytes(cells), sources, pairs)
+
+
+def scores_key(game, position):
+    """Key of a score breakdown: the traced position plus the game's scoring setup"""
+    return ('scores', position, tuple(game.amplifier_tiles),
+            tuple(tuple(objective['id'] for objective in objectives) for objectives in game.objectives),
+            tuple(sorted(game.disconnected_players)), len(game.players))
@@ -0,0 +1,76 @@
+"""Zobrist hashing of game positions.
+
+A position hash is the XOR of one 64-bit key per fact about the position:
+each occupied cell's piece code, whose turn it is, the round, a half-placed
+portal, and every player's piece counts and energy. A move only changes a
+few of those facts, so make_move() updates the hash by XORing the old keys
+out and the new ones in instead of rehashing the whole game.
+
+Keys are derived from the fact itself with SplitMix64 rather than drawn
+into tables, so they need no memory per board size and are the same in
+every process.
+"""
+from functools import lru_cache
+
+from light_engine import PIECE_KINDS
+
+MASK64 = (1 << 64) - 1
+
+# First field of every key, so facts of different kinds never share one
+CELL, TURN, ROUND, PORTAL, INVENTORY, ENERGY = range(6)
+
+
+def _splitmix64(value):
+    value = (value + 0x9E3779B97F4A7C15) & MASK64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK64
+    return value ^ (value >> 31)
+
+
+@lru_cache(maxsize=1 << 16)
+def key(*fields):
+    """64-bit key of a fact given as small non-negative integers"""
+    value = 0
+    for field in fields:
+        value = _splitmix64(value ^ field)
+    return value
+
+
+def cell_key(cell, code):
+    """Key of a piece code on a cell id; empty cells contribute nothing"""
+    return key(CELL, cell, code) if code else 0
+
+
+def portal_key(in_progress, size):
+    """Key of a half-placed portal pair, or 0 when none is in progress"""
+    if not in_progress:
+        return 0
+    x, y = in_progress['first_portal']
+    return key(PORTAL, in_progress['player'], y * size + x)
+
+
+def inventory_key(player_idx, piece_type, count):
+    return key(INVENTORY, player_idx, PIECE_KINDS[piece_type], count)
+
+
+def energy_key(player_idx, energy):
+    return key(ENERGY, player_idx, energy)
+
+
+def game_hash(game):
+    """Hash a whole position from scratch"""
+    value = key(TURN, game.current_player) ^ key(ROUND, game.round_number)
+    value ^= portal_key(game.portal_placement_in_progress, game.board_size)
+
+    for cell, code in enumerate(game.board.cells):
+        if code:
+            value ^= key(CELL, cell, code)
+
+    for player_idx, inventory in enumerate(game.player_inventory):
+        for piece_type, count in inventory.items():
+            value ^= inventory_key(player_idx, piece_type, count)
+
+    for player_idx, energy in enumerate(game.player_energy):
+        value ^= energy_key(player_idx, energy)
+
+    return value